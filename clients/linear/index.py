@@ -1,22 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import streamlit as st
 import requests
-from typing import Dict, List, Optional, Any
-
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 
 LINEAR_API_URL = "https://api.linear.app/graphql"
 LINEAR_API_KEY = st.secrets["LINEAR_API_KEY"]
 LINEAR_TEAM_ID = st.secrets.get("LINEAR_TEAM_ID", None)
 
-
-def gql(query: str, variables: dict = None) -> dict:
+LABEL_CACHE_TTL_SECONDS = 15 * 60
+
+# Process-wide label name -> id index shared by every ticket-creation path.
+_label_ids_by_name: Dict[str, str] = {}
+_label_ids_loaded_at: Optional[float] = None
+_label_lock = threading.Lock()
+
+# Linear rejects any single request above 10,000 complexity points. Mutations are
+# estimated conservatively so a packed document stays well under the limit.
+LINEAR_MAX_QUERY_COMPLEXITY = 10_000
+LINEAR_MUTATION_COMPLEXITY_ESTIMATE = 100
+LINEAR_MAX_MUTATIONS_PER_REQUEST = 50
+
+DEFAULT_ISSUE_FIELDS = [
+    "id",
+    "title",
+    "updatedAt",
+    "priority",
+    "state.id",
+    "state.name",
+    "state.type",
+]
+
+PENDING_STATE_TYPES = ["backlog", "unstarted", "started"]
+ISSUE_CACHE_FULL_REFRESH_SECONDS = 30 * 60
+# Deltas overlap a little so clock skew can't drop an update; merges are idempotent
+ISSUE_CACHE_WATERMARK_OVERLAP = timedelta(minutes=1)
+
+# Process-wide cache of pending issues keyed by id, kept fresh with updatedAt deltas.
+_issue_cache: Dict[str, Dict[str, Any]] = {}
+_issue_cache_watermark: Optional[str] = None
+_issue_cache_fields: set = set()
+_issue_cache_loaded_at: Optional[float] = None
+_issue_cache_lock = threading.Lock()
+
+LINEAR_RATE_LIMIT_RETRIES = 5
+LINEAR_RATE_LIMIT_MAX_WAIT_SECONDS = 60
+
+
+def post_gql(query: str, variables: dict = None) -> dict:
+    """Send a GraphQL document and return the raw response body (data + errors)."""
     headers = {
         "Authorization": LINEAR_API_KEY,
         "Content-Type": "application/json",
     }
     payload = {"query": query, "variables": variables or {}}
 
-    resp = requests.post(LINEAR_API_URL, json=payload, headers=headers)
-    data = resp.json()
+    for attempt in range(LINEAR_RATE_LIMIT_RETRIES + 1):
+        resp = requests.post(LINEAR_API_URL, json=payload, headers=headers)
+        data = resp.json()
+        if not _is_rate_limited(resp, data) or attempt == LINEAR_RATE_LIMIT_RETRIES:
+            return data
+        time.sleep(_rate_limit_wait_seconds(resp, attempt))
+
+    return data
+
+
+def _is_rate_limited(resp: requests.Response, data: dict) -> bool:
+    if resp.status_code == 429:
+        return True
+    return any(
+        (e.get("extensions") or {}).get("code") == "RATELIMITED"
+        for e in data.get("errors") or []
+    )
+
+
+def _rate_limit_wait_seconds(resp: requests.Response, attempt: int) -> float:
+    # Linear reports when the request window resets as epoch milliseconds
+    reset_ms = resp.headers.get("X-RateLimit-Requests-Reset")
+    if reset_ms:
+        try:
+            wait = int(reset_ms) / 1000 - time.time()
+            return min(max(wait, 1), LINEAR_RATE_LIMIT_MAX_WAIT_SECONDS)
+        except ValueError:
+            pass
+    return min(2**attempt, LINEAR_RATE_LIMIT_MAX_WAIT_SECONDS)
+
+
+def gql(query: str, variables: dict = None) -> dict:
+    data = post_gql(query, variables)
 
     if "errors" in data:
         raise RuntimeError(f"Linear GraphQL Error: {data['errors']}")
@@ -24,6 +98,100 @@ def gql(query: str, variables: dict = None) -> dict:
     return data["data"]
 
 
+def linear_mutation(
+    mutation: str, args: Dict[str, Tuple[str, Any]], selection: str
+) -> Dict[str, Any]:
+    """
+    Describe one mutation for execute_linear_mutations.
+
+    args maps argument name -> (GraphQL type, value), e.g.
+    linear_mutation("issueDelete", {"id": ("String!", issue_id)}, "success")
+    """
+    return {"mutation": mutation, "args": args, "selection": selection}
+
+
+def _is_complexity_error(errors: List[Dict[str, Any]]) -> bool:
+    return any("complex" in str(e.get("message", "")).lower() for e in errors)
+
+
+def _build_mutation_document(
+    operations: List[Dict[str, Any]],
+) -> Tuple[str, Dict[str, Any]]:
+    var_defs = []
+    fields = []
+    variables = {}
+    for i, op in enumerate(operations):
+        alias = f"op{i}"
+        call_args = []
+        for arg_name, (arg_type, value) in op["args"].items():
+            var_name = f"{alias}_{arg_name}"
+            var_defs.append(f"${var_name}: {arg_type}")
+            call_args.append(f"{arg_name}: ${var_name}")
+            variables[var_name] = value
+        fields.append(
+            f"  {alias}: {op['mutation']}({', '.join(call_args)}) {{ {op['selection']} }}"
+        )
+
+    document = f"mutation Batch({', '.join(var_defs)}) {{\n" + "\n".join(fields) + "\n}"
+    return document, variables
+
+
+def _execute_mutation_batch(operations: List[Dict[str, Any]]) -> List[Any]:
+    document, variables = _build_mutation_document(operations)
+    body = post_gql(document, variables)
+    errors = body.get("errors") or []
+    data = body.get("data") or {}
+
+    if errors and _is_complexity_error(errors) and len(operations) > 1:
+        # Too big for one request: split in half and try again
+        mid = len(operations) // 2
+        return _execute_mutation_batch(operations[:mid]) + _execute_mutation_batch(
+            operations[mid:]
+        )
+
+    errors_by_alias: Dict[str, List[Dict[str, Any]]] = {}
+    document_errors = []
+    for e in errors:
+        path = e.get("path") or []
+        if path:
+            errors_by_alias.setdefault(str(path[0]), []).append(e)
+        else:
+            document_errors.append(e)
+
+    results = []
+    for i in range(len(operations)):
+        alias = f"op{i}"
+        op_errors = errors_by_alias.get(alias, []) + document_errors
+        if data.get(alias) is not None:
+            results.append(data[alias])
+        else:
+            results.append(
+                RuntimeError(f"Linear GraphQL Error: {op_errors or 'no data returned'}")
+            )
+    return results
+
+
+def execute_linear_mutations(
+    operations: List[Dict[str, Any]], batch_size: Optional[int] = None
+) -> List[Any]:
+    """
+    Run many mutations in as few requests as possible by packing them into aliased
+    GraphQL documents. Returns one entry per operation, in input order: the
+    mutation payload on success or a RuntimeError describing the failure.
+    """
+    if batch_size is None:
+        batch_size = min(
+            LINEAR_MAX_MUTATIONS_PER_REQUEST,
+            LINEAR_MAX_QUERY_COMPLEXITY // LINEAR_MUTATION_COMPLEXITY_ESTIMATE,
+        )
+    batch_size = max(1, batch_size)
+
+    results = []
+    for i in range(0, len(operations), batch_size):
+        results.extend(_execute_mutation_batch(operations[i : i + batch_size]))
+    return results
+
+
 def get_issue_by_identifier(identifier: str):
     query = """
     query GetIssue($id: String!) {
@@ -72,56 +240,285 @@ def remove_linear_ticket(issue_id: str) -> bool:
     }
     """
     result = gql(query, {"id": issue_id})
+    _evict_cached_issues([issue_id])
     return result["issueDelete"]["success"]
 
 
-def fetch_issues(filter_obj: Dict[str, Any]) -> List[Dict]:
-    query = """
-    query FetchIssues($after: String, $filter: IssueFilter) {
-      issues(first: 200, after: $after, filter: $filter) {
-        nodes {
-          id
-          title
-          updatedAt
-          priority
-          state { id name type }
-        }
-        pageInfo { hasNextPage endCursor }
-      }
-    }
+def update_linear_ticket_titles(titles_by_issue_id: Dict[str, str]) -> List[Any]:
+    return execute_linear_mutations(
+        [
+            linear_mutation(
+                "issueUpdate",
+                {
+                    "id": ("String!", issue_id),
+                    "input": ("IssueUpdateInput!", {"title": title}),
+                },
+                "issue { id title }",
+            )
+            for issue_id, title in titles_by_issue_id.items()
+        ]
+    )
+
+
+def update_linear_ticket_priorities(
+    priorities_by_issue_id: Dict[str, int],
+) -> List[Any]:
+    return execute_linear_mutations(
+        [
+            linear_mutation(
+                "issueUpdate",
+                {
+                    "id": ("String!", issue_id),
+                    "input": ("IssueUpdateInput!", {"priority": priority}),
+                },
+                "success",
+            )
+            for issue_id, priority in priorities_by_issue_id.items()
+        ]
+    )
+
+
+def remove_linear_tickets(issue_ids: List[str]) -> List[Any]:
+    results = execute_linear_mutations(
+        [
+            linear_mutation("issueDelete", {"id": ("String!", issue_id)}, "success")
+            for issue_id in issue_ids
+        ]
+    )
+    _evict_cached_issues(
+        [i for i, r in zip(issue_ids, results) if not isinstance(r, Exception)]
+    )
+    return results
+
+
+def build_selection(fields: List[str]) -> str:
+    """
+    Turn a field projection such as ["id", "title", "state.type"] into a minimal
+    GraphQL selection set body: "id title state { type }".
     """
+    tree: Dict[str, dict] = {}
+    for field in fields:
+        node = tree
+        for part in field.split("."):
+            node = node.setdefault(part, {})
 
-    all_issues = []
+    def render(node: Dict[str, dict]) -> str:
+        return " ".join(
+            f"{name} {{ {render(children)} }}" if children else name
+            for name, children in node.items()
+        )
+
+    return render(tree)
+
+
+def partition_issue_filter(filter_obj: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Split a filter on several state types into one filter per state type, so each
+    can be paginated as an independent cursor chain. Other filters pass through.
+    """
+    state_types = ((filter_obj.get("state") or {}).get("type") or {}).get("in")
+    if not state_types or len(state_types) < 2:
+        return [filter_obj]
+
+    return [
+        {**filter_obj, "state": {**filter_obj["state"], "type": {"eq": state_type}}}
+        for state_type in state_types
+    ]
+
+
+def _crawl_issue_pages(
+    query: str, filter_obj: Dict[str, Any], stop: threading.Event
+) -> Iterator[List[Dict]]:
     cursor = None
-    while True:
+    while not stop.is_set():
         resp = gql(query, {"after": cursor, "filter": filter_obj})
         issues = resp["issues"]
-        all_issues.extend(issues["nodes"])
+        yield issues["nodes"]
 
         if not issues["pageInfo"]["hasNextPage"]:
             break
 
         cursor = issues["pageInfo"]["endCursor"]
 
-    return all_issues
+
+def iter_issues(
+    filter_obj: Dict[str, Any], fields: Optional[List[str]] = None
+) -> Iterator[Dict]:
+    """
+    Stream issues matching filter_obj as pages arrive. Multi-state filters are
+    crawled as concurrent per-state partitions and merged (deduplicated by id).
+    """
+    selection = build_selection(["id", *(fields or DEFAULT_ISSUE_FIELDS)])
+    query = f"""
+    query FetchIssues($after: String, $filter: IssueFilter) {{
+      issues(first: 200, after: $after, filter: $filter) {{
+        nodes {{ {selection} }}
+        pageInfo {{ hasNextPage endCursor }}
+      }}
+    }}
+    """
+
+    partitions = partition_issue_filter(filter_obj)
+    stop = threading.Event()
+    pages: queue.Queue = queue.Queue()
+
+    def crawl(partition: Dict[str, Any]) -> None:
+        try:
+            for page in _crawl_issue_pages(query, partition, stop):
+                pages.put(("page", page))
+        except Exception as e:
+            pages.put(("error", e))
+        finally:
+            pages.put(("done", None))
+
+    seen = set()
+    with ThreadPoolExecutor(max_workers=len(partitions)) as pool:
+        for partition in partitions:
+            pool.submit(crawl, partition)
+
+        try:
+            remaining = len(partitions)
+            while remaining:
+                kind, payload = pages.get()
+                if kind == "done":
+                    remaining -= 1
+                elif kind == "error":
+                    raise payload
+                else:
+                    for issue in payload:
+                        # An issue can change state mid-crawl and show up twice
+                        if issue["id"] not in seen:
+                            seen.add(issue["id"])
+                            yield issue
+        finally:
+            stop.set()
+
+
+def fetch_issues(
+    filter_obj: Dict[str, Any], fields: Optional[List[str]] = None
+) -> List[Dict]:
+    return list(iter_issues(filter_obj, fields))
+
+
+def _watermark(now: datetime) -> str:
+    watermark = now - ISSUE_CACHE_WATERMARK_OVERLAP
+    return watermark.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def refresh_issue_cache(
+    force_full: bool = False, fields: Optional[List[str]] = None
+) -> None:
+    """
+    Bring the local pending-issue cache up to date.
+
+    The first call (and one every ISSUE_CACHE_FULL_REFRESH_SECONDS, which also
+    drops issues archived outside this app) crawls every pending issue. Later
+    calls only fetch issues updated since the last watermark and merge them in;
+    issues that moved out of a pending state are dropped. Asking for fields the
+    cache doesn't hold yet widens its projection and forces a full crawl.
+    """
+    global _issue_cache_watermark, _issue_cache_loaded_at, _issue_cache_fields
+
+    with _issue_cache_lock:
+        started_at = datetime.now(timezone.utc)
+        # The cache itself needs ids, watermarks and state types to merge deltas
+        required = {"id", "updatedAt", "state.type", *(fields or DEFAULT_ISSUE_FIELDS)}
+        expired = (
+            _issue_cache_loaded_at is None
+            or time.monotonic() - _issue_cache_loaded_at
+            > ISSUE_CACHE_FULL_REFRESH_SECONDS
+        )
+
+        if force_full or expired or not required <= _issue_cache_fields:
+            # Only widen the projection once the crawl has succeeded, so a failed
+            # crawl can't leave the cache claiming fields its issues don't have
+            widened_fields = _issue_cache_fields | required
+            issues = fetch_issues(
+                {"state": {"type": {"in": PENDING_STATE_TYPES}}},
+                fields=sorted(widened_fields),
+            )
+            _issue_cache_fields = widened_fields
+            _issue_cache.clear()
+            _issue_cache.update({issue["id"]: issue for issue in issues})
+            _issue_cache_loaded_at = time.monotonic()
+        else:
+            delta = fetch_issues(
+                {"updatedAt": {"gt": _issue_cache_watermark}},
+                fields=sorted(_issue_cache_fields),
+            )
+            for issue in delta:
+                if issue["state"]["type"] in PENDING_STATE_TYPES:
+                    _issue_cache[issue["id"]] = issue
+                else:
+                    _issue_cache.pop(issue["id"], None)
+
+        _issue_cache_watermark = _watermark(started_at)
+
+
+def _evict_cached_issues(issue_ids: List[str]) -> None:
+    # Deleted issues never show up in an updatedAt delta, so drop them eagerly
+    with _issue_cache_lock:
+        for issue_id in issue_ids:
+            _issue_cache.pop(issue_id, None)
+
+
+def get_cached_issues(
+    state_types: List[str], fields: Optional[List[str]] = None
+) -> List[Dict]:
+    refresh_issue_cache(fields=fields)
+    with _issue_cache_lock:
+        return [
+            dict(issue)
+            for issue in _issue_cache.values()
+            if issue["state"]["type"] in state_types
+        ]
+
+
+def build_issue_filter(
+    state_types: List[str],
+    title_starts_with: Optional[str] = None,
+    title_contains: Optional[str] = None,
+) -> Dict[str, Any]:
+    filter_obj: Dict[str, Any] = {"state": {"type": {"in": state_types}}}
+
+    # Comparator keys on the same field are ANDed together by Linear
+    title_filter = {}
+    if title_starts_with:
+        title_filter["startsWith"] = title_starts_with
+    if title_contains:
+        title_filter["contains"] = title_contains
+    if title_filter:
+        filter_obj["title"] = title_filter
+
+    return filter_obj
+
+
+def get_pending_linear_tickets_by_title(
+    title_starts_with: Optional[str] = None,
+    title_contains: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> List[Dict]:
+    """Fetch only pending issues whose title matches, filtering on Linear's side."""
+    return fetch_issues(
+        build_issue_filter(PENDING_STATE_TYPES, title_starts_with, title_contains),
+        fields=fields,
+    )
 
 
-def get_backlog_linear_tickets():
-    return fetch_issues({"state": {"type": {"in": ["unstarted", "backlog"]}}})
+def get_backlog_linear_tickets(fields: Optional[List[str]] = None):
+    return get_cached_issues(["unstarted", "backlog"], fields)
 
 
-def get_in_progress_linear_tickets():
-    return fetch_issues({"state": {"type": {"eq": "started"}}})
+def get_in_progress_linear_tickets(fields: Optional[List[str]] = None):
+    return get_cached_issues(["started"], fields)
 
 
-def get_unstarted_linear_tickets():
-    return fetch_issues({"state": {"type": {"in": ["unstarted", "backlog"]}}})
+def get_unstarted_linear_tickets(fields: Optional[List[str]] = None):
+    return get_cached_issues(["unstarted", "backlog"], fields)
 
 
-def get_pending_linear_tickets():
-    return fetch_issues(
-        {"state": {"type": {"in": ["unstarted", "started", "backlog"]}}}
-    )
+def get_pending_linear_tickets(fields: Optional[List[str]] = None):
+    return get_cached_issues(["unstarted", "started", "backlog"], fields)
 
 
 def fetch_linear_labels():
@@ -150,30 +547,61 @@ def fetch_linear_labels():
     return labels
 
 
+def get_linear_label_ids(force_refresh: bool = False) -> Dict[str, str]:
+    """Return the cached label name -> id index, crawling labels once per TTL."""
+    global _label_ids_loaded_at
+
+    with _label_lock:
+        expired = (
+            _label_ids_loaded_at is None
+            or time.monotonic() - _label_ids_loaded_at > LABEL_CACHE_TTL_SECONDS
+        )
+        if force_refresh or expired:
+            index = {}
+            for l in fetch_linear_labels():
+                # Keep the first match, like the previous linear scan did
+                index.setdefault(l["name"], l["id"])
+            _label_ids_by_name.clear()
+            _label_ids_by_name.update(index)
+            _label_ids_loaded_at = time.monotonic()
+
+        return _label_ids_by_name
+
+
+def resolve_linear_label_id(label: str) -> str:
+    """Look up a label id by name, creating the label (and caching it) if missing."""
+    if not LINEAR_TEAM_ID:
+        raise RuntimeError("Missing LINEAR_TEAM_ID in st.secrets")
+
+    label_id = get_linear_label_ids().get(label)
+    if label_id:
+        return label_id
+
+    with _label_lock:
+        # Another session may have created it while we were waiting on the lock
+        label_id = _label_ids_by_name.get(label)
+        if label_id:
+            return label_id
+
+        create_label_q = """
+        mutation CreateLabel($name: String!, $teamId: String!) {
+          issueLabelCreate(input:{name:$name, teamId:$teamId}) {
+            issueLabel { id name }
+          }
+        }
+        """
+        res = gql(create_label_q, {"name": label, "teamId": LINEAR_TEAM_ID})
+        created = res["issueLabelCreate"]["issueLabel"]
+        _label_ids_by_name[created["name"]] = created["id"]
+        return created["id"]
+
+
 def create_linear_ticket(
     title: str, description: str, label: str = None, priority: int = None
 ):
     if not LINEAR_TEAM_ID:
         raise RuntimeError("Missing LINEAR_TEAM_ID in st.secrets")
 
-    # Resolve or create label
-    label_id = None
-    if label:
-        labels = fetch_linear_labels()
-        match = next((l for l in labels if l["name"] == label), None)
-        if match:
-            label_id = match["id"]
-        else:
-            create_label_q = """
-            mutation CreateLabel($name: String!, $teamId: String!) {
-              issueLabelCreate(input:{name:$name, teamId:$teamId}) {
-                issueLabel { id name }
-              }
-            }
-            """
-            res = gql(create_label_q, {"name": label, "teamId": LINEAR_TEAM_ID})
-            label_id = res["issueLabelCreate"]["issueLabel"]["id"]
-
     # Create issue
     create_issue_q = """
     mutation CreateIssue($input: IssueCreateInput!) {
@@ -183,6 +611,45 @@ def create_linear_ticket(
     }
     """
 
+    input_data = _issue_create_input(title, description, label, priority)
+    res = gql(create_issue_q, {"input": input_data})
+    return res["issueCreate"]["issue"]
+
+
+def create_linear_tickets(tickets: List[Dict[str, Any]]) -> List[Any]:
+    """
+    Bulk version of create_linear_ticket. Each ticket is a dict with "title",
+    "description" and optional "label" / "priority" keys.
+    """
+    if not LINEAR_TEAM_ID:
+        raise RuntimeError("Missing LINEAR_TEAM_ID in st.secrets")
+
+    operations = [
+        linear_mutation(
+            "issueCreate",
+            {
+                "input": (
+                    "IssueCreateInput!",
+                    _issue_create_input(
+                        t["title"], t["description"], t.get("label"), t.get("priority")
+                    ),
+                )
+            },
+            "issue { id title }",
+        )
+        for t in tickets
+    ]
+    return [
+        r if isinstance(r, Exception) else r["issue"]
+        for r in execute_linear_mutations(operations)
+    ]
+
+
+def _issue_create_input(
+    title: str, description: str, label: str = None, priority: int = None
+) -> Dict[str, Any]:
+    label_id = resolve_linear_label_id(label) if label else None
+
     input_data = {
         "title": title,
         "description": description,
@@ -192,6 +659,4 @@ def create_linear_ticket(
         input_data["priority"] = priority
     if label_id:
         input_data["labelIds"] = [label_id]
-
-    res = gql(create_issue_q, {"input": input_data})
-    return res["issueCreate"]["issue"]
+    return input_data
@@ -0,0 +1,115 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, Type, TypeVar
+
+T = TypeVar("T")
+
+# A call slower than this multiple of the best smoothed latency seen counts as
+# congestion: the limit stops growing until latency recovers
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2
+OVERLOAD_RETRIES = 5
+OVERLOAD_MAX_WAIT_SECONDS = 30
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease cap on in-flight calls.
+
+    Every healthy completion adds increase / limit, so the limit grows by about
+    `increase` per limit's worth of calls. An overload (429, timeout) multiplies
+    it by `decrease`, at most once per smoothed latency so a burst of failures
+    from the same window only cuts it once. Overloaded calls are retried with
+    backoff through the limiter, and so are transient failures (5xx, dropped
+    connections), which don't change the limit.
+    """
+
+    def __init__(
+        self,
+        initial: int = 8,
+        minimum: int = 1,
+        maximum: int = 64,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        overload_errors: Tuple[Type[BaseException], ...] = (asyncio.TimeoutError,),
+        transient_errors: Tuple[Type[BaseException], ...] = (),
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.overload_errors = overload_errors
+        self.transient_errors = transient_errors
+        self.in_flight = 0
+        self.successes = 0
+        self.overloads = 0
+        self._condition = asyncio.Condition()
+        self._latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.minimum, int(self.limit))
+
+    async def _acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.current_limit)
+            self.in_flight += 1
+
+    async def _release(self) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def _on_success(self, latency: float) -> None:
+        self.successes += 1
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += LATENCY_SMOOTHING * (latency - self._latency)
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+
+        if self._latency <= self._best_latency * LATENCY_TOLERANCE:
+            self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+
+    def _on_overload(self) -> None:
+        self.overloads += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= (self._latency or 1.0):
+            self.limit = max(self.minimum, self.limit * self.decrease)
+            self._last_decrease = now
+
+    async def call(self, make_call: Callable[[], Awaitable[T]]) -> T:
+        """Run make_call() within the limit, retrying failures with backoff."""
+        attempt = 0
+        while True:
+            await self._acquire()
+            started = time.monotonic()
+            try:
+                result = await make_call()
+            except self.overload_errors:
+                self._on_overload()
+                if attempt >= OVERLOAD_RETRIES:
+                    raise
+            except self.transient_errors:
+                if attempt >= OVERLOAD_RETRIES:
+                    raise
+            else:
+                self._on_success(time.monotonic() - started)
+                return result
+            finally:
+                await self._release()
+
+            wait = min(2**attempt, OVERLOAD_MAX_WAIT_SECONDS)
+            await asyncio.sleep(wait * (0.5 + random.random() / 2))
+            attempt += 1
+
+    def summary(self) -> str:
+        return (
+            f"concurrency limit {self.current_limit} "
+            f"({self.in_flight} in flight, {self.overloads} throttled)"
+        )
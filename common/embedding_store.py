@@ -0,0 +1,190 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EMBEDDING_STORE_DIR = os.environ.get(
+    "EMBEDDING_STORE_DIR", os.path.join(".cache", "embeddings")
+)
+EMBEDDING_STORE_INITIAL_CAPACITY = 1_024
+# Rows scored per block during search, to bound memory on large stores
+EMBEDDING_SEARCH_BLOCK_ROWS = 65_536
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    On-disk embedding store for one model. Unit-normalized float32 vectors live
+    in a memory-mapped matrix file; a SQLite index maps text hash -> row.
+    """
+
+    def __init__(self, model: str, directory: str = EMBEDDING_STORE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.model = model
+        self._vectors_path = os.path.join(directory, f"{safe_model}.f32")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, f"{safe_model}.sqlite3"), check_same_thread=False
+        )
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS vectors (
+                key TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                text TEXT NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT name, value FROM meta").fetchall())
+        self.dim: Optional[int] = meta.get("dim")
+        self.count: int = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[
+            0
+        ]
+        self._matrix: Optional[np.memmap] = None
+        if self.dim and os.path.exists(self._vectors_path):
+            capacity = os.path.getsize(self._vectors_path) // (4 * self.dim)
+            self._open(max(capacity, self.count))
+
+    def _open(self, capacity: int) -> None:
+        mode = "r+" if os.path.exists(self._vectors_path) else "w+"
+        if self._matrix is not None:
+            self._matrix.flush()
+        # r+ extends the file when the requested shape is larger
+        self._matrix = np.memmap(
+            self._vectors_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim)
+        )
+
+    def get(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Return stored vectors for whichever texts are already embedded."""
+        if not texts or self._matrix is None:
+            return {}
+        keys = {text_hash(t): t for t in texts}
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            key_list = list(keys)
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i : i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, row FROM vectors WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, row in rows:
+                    found[keys[key]] = np.array(self._matrix[row])
+        return found
+
+    def put(self, texts: List[str], vectors: np.ndarray) -> None:
+        """Append vectors for texts that aren't stored yet."""
+        if not texts:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)",
+                    (self.dim,),
+                )
+            if vectors.shape[1] != self.dim:
+                raise ValueError(
+                    f"Embedding dim {vectors.shape[1]} doesn't match store dim {self.dim}"
+                )
+
+            new_rows = []
+            seen = set()
+            for text, vector in zip(texts, vectors):
+                key = text_hash(text)
+                if key in seen:
+                    continue
+                seen.add(key)
+                exists = self._conn.execute(
+                    "SELECT 1 FROM vectors WHERE key = ?", (key,)
+                ).fetchone()
+                if not exists:
+                    new_rows.append((key, text, vector))
+            if not new_rows:
+                self._conn.commit()
+                return
+
+            needed = self.count + len(new_rows)
+            capacity = 0 if self._matrix is None else self._matrix.shape[0]
+            if needed > capacity:
+                self._open(max(needed, capacity * 2, EMBEDDING_STORE_INITIAL_CAPACITY))
+
+            for offset, (key, text, vector) in enumerate(new_rows):
+                row = self.count + offset
+                self._matrix[row] = vector
+                self._conn.execute(
+                    "INSERT INTO vectors (key, row, text) VALUES (?, ?, ?)",
+                    (key, row, text),
+                )
+            self._matrix.flush()
+            self._conn.commit()
+            self.count = needed
+
+    def search(self, queries: np.ndarray, k: int = 10) -> List[List[Tuple[str, float]]]:
+        """Top-k cosine matches in the store for each query row, best first."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self._matrix is None or not self.count or not len(queries):
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        with self._lock:
+            k = min(k, self.count)
+            best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+            for start in range(0, self.count, EMBEDDING_SEARCH_BLOCK_ROWS):
+                stop = min(start + EMBEDDING_SEARCH_BLOCK_ROWS, self.count)
+                scores = queries @ np.asarray(self._matrix[start:stop]).T
+                rows = np.broadcast_to(np.arange(start, stop), scores.shape)
+                best_scores = np.concatenate([best_scores, scores], axis=1)
+                best_rows = np.concatenate([best_rows, rows], axis=1)
+                if best_scores.shape[1] > k:
+                    top = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                    best_scores = np.take_along_axis(best_scores, top, axis=1)
+                    best_rows = np.take_along_axis(best_rows, top, axis=1)
+
+            order = np.argsort(-best_scores, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+            wanted = sorted({int(r) for r in best_rows.ravel()})
+            texts = {}
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i : i + 500]
+                texts.update(
+                    self._conn.execute(
+                        f"SELECT row, text FROM vectors WHERE row IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                )
+
+        return [
+            [(texts[int(r)], float(s)) for r, s in zip(rows, scores)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+
+_embedding_stores: Dict[str, EmbeddingStore] = {}
+_embedding_stores_lock = threading.Lock()
+
+
+def get_or_create_embedding_store(model: str) -> EmbeddingStore:
+    with _embedding_stores_lock:
+        if model not in _embedding_stores:
+            _embedding_stores[model] = EmbeddingStore(model)
+        return _embedding_stores[model]
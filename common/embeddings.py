@@ -0,0 +1,69 @@
+from typing import List
+
+import numpy as np
+
+from common.embedding_store import get_or_create_embedding_store
+from common.utils import get_or_create_async_openai_client, get_or_create_openai_client
+
+EMBEDDING_MODEL = "text-embedding-3-large"
+EMBEDDING_BATCH_SIZE = 256
+
+
+def _assemble(texts: List[str], known: dict) -> np.ndarray:
+    return normalize_rows(np.asarray([known[t] for t in texts], dtype=np.float32))
+
+
+async def get_embeddings_async(
+    texts: List[str], model: str = EMBEDDING_MODEL
+) -> np.ndarray:
+    """
+    Embed texts and return an (n x dim) float32 matrix of unit rows. Vectors are
+    reused from the local embedding store; only unseen texts hit the API, in
+    batches.
+    """
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    store = get_or_create_embedding_store(model)
+    known = store.get(texts)
+    missing = list(dict.fromkeys(t for t in texts if t not in known))
+
+    client = get_or_create_async_openai_client()
+    for i in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch = missing[i : i + EMBEDDING_BATCH_SIZE]
+        response = await client.embeddings.create(model=model, input=batch)
+        vectors = [item.embedding for item in response.data]
+        store.put(batch, vectors)
+        known.update(zip(batch, vectors))
+
+    return _assemble(texts, known)
+
+
+def get_embeddings(texts: List[str], model: str = EMBEDDING_MODEL) -> np.ndarray:
+    """Synchronous get_embeddings_async, for pages that don't run an event loop."""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    store = get_or_create_embedding_store(model)
+    known = store.get(texts)
+    missing = list(dict.fromkeys(t for t in texts if t not in known))
+
+    client = get_or_create_openai_client()
+    for i in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+        batch = missing[i : i + EMBEDDING_BATCH_SIZE]
+        response = client.embeddings.create(model=model, input=batch)
+        vectors = [item.embedding for item in response.data]
+        store.put(batch, vectors)
+        known.update(zip(batch, vectors))
+
+    return _assemble(texts, known)
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def cosine_similarity_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise cosine similarity between the rows of a and the rows of b."""
+    return normalize_rows(a) @ normalize_rows(b).T
@@ -0,0 +1,540 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+US_STATES: Dict[str, str] = {
+    "AL": "alabama",
+    "AK": "alaska",
+    "AZ": "arizona",
+    "AR": "arkansas",
+    "CA": "california",
+    "CO": "colorado",
+    "CT": "connecticut",
+    "DE": "delaware",
+    "DC": "district of columbia",
+    "FL": "florida",
+    "GA": "georgia",
+    "HI": "hawaii",
+    "ID": "idaho",
+    "IL": "illinois",
+    "IN": "indiana",
+    "IA": "iowa",
+    "KS": "kansas",
+    "KY": "kentucky",
+    "LA": "louisiana",
+    "ME": "maine",
+    "MD": "maryland",
+    "MA": "massachusetts",
+    "MI": "michigan",
+    "MN": "minnesota",
+    "MS": "mississippi",
+    "MO": "missouri",
+    "MT": "montana",
+    "NE": "nebraska",
+    "NV": "nevada",
+    "NH": "new hampshire",
+    "NJ": "new jersey",
+    "NM": "new mexico",
+    "NY": "new york",
+    "NC": "north carolina",
+    "ND": "north dakota",
+    "OH": "ohio",
+    "OK": "oklahoma",
+    "OR": "oregon",
+    "PA": "pennsylvania",
+    "RI": "rhode island",
+    "SC": "south carolina",
+    "SD": "south dakota",
+    "TN": "tennessee",
+    "TX": "texas",
+    "UT": "utah",
+    "VT": "vermont",
+    "VA": "virginia",
+    "WA": "washington",
+    "WV": "west virginia",
+    "WI": "wisconsin",
+    "WY": "wyoming",
+    "PR": "puerto rico",
+}
+
+# Largest US cities by state; enough to resolve the city part of most addresses
+US_CITIES: Dict[str, List[str]] = {
+    "AL": ["birmingham", "montgomery", "huntsville", "mobile", "tuscaloosa"],
+    "AK": ["anchorage", "fairbanks", "juneau"],
+    "AZ": [
+        "phoenix",
+        "tucson",
+        "mesa",
+        "chandler",
+        "scottsdale",
+        "glendale",
+        "gilbert",
+        "tempe",
+        "peoria",
+    ],
+    "AR": ["little rock", "fayetteville", "fort smith", "bentonville"],
+    "CA": [
+        "los angeles",
+        "san diego",
+        "san jose",
+        "san francisco",
+        "fresno",
+        "sacramento",
+        "long beach",
+        "oakland",
+        "bakersfield",
+        "anaheim",
+        "santa ana",
+        "riverside",
+        "irvine",
+        "stockton",
+        "fremont",
+        "san bernardino",
+        "pasadena",
+        "santa monica",
+        "palo alto",
+    ],
+    "CO": [
+        "denver",
+        "colorado springs",
+        "aurora",
+        "fort collins",
+        "boulder",
+        "lakewood",
+    ],
+    "CT": ["bridgeport", "new haven", "hartford", "stamford"],
+    "DE": ["wilmington", "dover"],
+    "DC": ["washington"],
+    "FL": [
+        "jacksonville",
+        "miami",
+        "tampa",
+        "orlando",
+        "st petersburg",
+        "hialeah",
+        "tallahassee",
+        "fort lauderdale",
+        "cape coral",
+        "sarasota",
+        "naples",
+        "boca raton",
+        "west palm beach",
+    ],
+    "GA": [
+        "atlanta",
+        "augusta",
+        "columbus",
+        "macon",
+        "savannah",
+        "athens",
+        "alpharetta",
+        "marietta",
+    ],
+    "HI": ["honolulu"],
+    "ID": ["boise", "meridian", "nampa"],
+    "IL": [
+        "chicago",
+        "aurora",
+        "naperville",
+        "joliet",
+        "rockford",
+        "springfield",
+        "evanston",
+    ],
+    "IN": ["indianapolis", "fort wayne", "evansville", "south bend", "carmel"],
+    "IA": ["des moines", "cedar rapids", "davenport", "iowa city"],
+    "KS": ["wichita", "overland park", "kansas city", "olathe", "topeka"],
+    "KY": ["louisville", "lexington", "bowling green"],
+    "LA": ["new orleans", "baton rouge", "shreveport", "lafayette"],
+    "ME": ["portland", "bangor"],
+    "MD": ["baltimore", "columbia", "bethesda", "rockville", "annapolis"],
+    "MA": ["boston", "worcester", "springfield", "cambridge", "lowell"],
+    "MI": ["detroit", "grand rapids", "warren", "ann arbor", "lansing"],
+    "MN": ["minneapolis", "st paul", "rochester", "duluth", "bloomington"],
+    "MS": ["jackson", "gulfport"],
+    "MO": ["kansas city", "st louis", "springfield", "columbia"],
+    "MT": ["billings", "missoula", "bozeman"],
+    "NE": ["omaha", "lincoln"],
+    "NV": ["las vegas", "henderson", "reno"],
+    "NH": ["manchester", "nashua"],
+    "NJ": ["newark", "jersey city", "paterson", "trenton", "hoboken"],
+    "NM": ["albuquerque", "las cruces", "santa fe"],
+    "NY": [
+        "new york",
+        "new york city",
+        "nyc",
+        "brooklyn",
+        "queens",
+        "bronx",
+        "manhattan",
+        "buffalo",
+        "rochester",
+        "yonkers",
+        "syracuse",
+        "albany",
+    ],
+    "NC": [
+        "charlotte",
+        "raleigh",
+        "greensboro",
+        "durham",
+        "winston salem",
+        "cary",
+        "wilmington",
+        "asheville",
+    ],
+    "ND": ["fargo", "bismarck"],
+    "OH": ["columbus", "cleveland", "cincinnati", "toledo", "akron", "dayton"],
+    "OK": ["oklahoma city", "tulsa", "norman", "broken arrow", "edmond"],
+    "OR": ["portland", "salem", "eugene", "bend"],
+    "PA": ["philadelphia", "pittsburgh", "allentown", "erie", "harrisburg", "scranton"],
+    "RI": ["providence", "warwick"],
+    "SC": ["charleston", "columbia", "greenville", "myrtle beach"],
+    "SD": ["sioux falls", "rapid city"],
+    "TN": [
+        "nashville",
+        "memphis",
+        "knoxville",
+        "chattanooga",
+        "murfreesboro",
+        "franklin",
+    ],
+    "TX": [
+        "houston",
+        "san antonio",
+        "dallas",
+        "austin",
+        "fort worth",
+        "el paso",
+        "arlington",
+        "corpus christi",
+        "plano",
+        "lubbock",
+        "laredo",
+        "irving",
+        "garland",
+        "frisco",
+        "mckinney",
+        "amarillo",
+        "round rock",
+        "the woodlands",
+        "sugar land",
+        "katy",
+    ],
+    "UT": ["salt lake city", "west valley city", "provo", "ogden", "st george"],
+    "VT": ["burlington"],
+    "VA": [
+        "virginia beach",
+        "norfolk",
+        "chesapeake",
+        "richmond",
+        "arlington",
+        "alexandria",
+    ],
+    "WA": ["seattle", "spokane", "tacoma", "vancouver", "bellevue", "redmond"],
+    "WV": ["charleston", "huntington", "morgantown"],
+    "WI": ["milwaukee", "madison", "green bay"],
+    "WY": ["cheyenne", "casper", "jackson"],
+    "PR": ["san juan"],
+}
+
+# Metro areas as (state, city) members, for whitelists like "Dallas-Fort Worth"
+US_METROS: Dict[str, List[Tuple[str, str]]] = {
+    "dallas fort worth": [
+        ("TX", c)
+        for c in [
+            "dallas",
+            "fort worth",
+            "arlington",
+            "plano",
+            "irving",
+            "garland",
+            "frisco",
+            "mckinney",
+        ]
+    ],
+    "dfw": [
+        ("TX", c)
+        for c in [
+            "dallas",
+            "fort worth",
+            "arlington",
+            "plano",
+            "irving",
+            "garland",
+            "frisco",
+            "mckinney",
+        ]
+    ],
+    "greater houston": [
+        ("TX", c) for c in ["houston", "the woodlands", "sugar land", "katy"]
+    ],
+    "bay area": [
+        ("CA", c)
+        for c in ["san francisco", "oakland", "san jose", "fremont", "palo alto"]
+    ],
+    "san francisco bay area": [
+        ("CA", c)
+        for c in ["san francisco", "oakland", "san jose", "fremont", "palo alto"]
+    ],
+    "greater los angeles": [
+        ("CA", c)
+        for c in [
+            "los angeles",
+            "long beach",
+            "anaheim",
+            "santa ana",
+            "irvine",
+            "pasadena",
+            "santa monica",
+            "riverside",
+            "san bernardino",
+        ]
+    ],
+    "new york metropolitan area": [
+        ("NY", c)
+        for c in [
+            "new york",
+            "new york city",
+            "nyc",
+            "brooklyn",
+            "queens",
+            "bronx",
+            "manhattan",
+            "yonkers",
+        ]
+    ]
+    + [("NJ", c) for c in ["newark", "jersey city", "hoboken", "paterson"]],
+    "tri state area": [
+        ("NY", c)
+        for c in [
+            "new york",
+            "new york city",
+            "nyc",
+            "brooklyn",
+            "queens",
+            "bronx",
+            "manhattan",
+            "yonkers",
+        ]
+    ]
+    + [("NJ", c) for c in ["newark", "jersey city", "hoboken", "paterson"]]
+    + [("CT", "stamford")],
+    "twin cities": [("MN", "minneapolis"), ("MN", "st paul"), ("MN", "bloomington")],
+    "greater boston": [("MA", c) for c in ["boston", "cambridge", "lowell"]],
+    "chicagoland": [
+        ("IL", c) for c in ["chicago", "aurora", "naperville", "joliet", "evanston"]
+    ],
+    "south florida": [
+        ("FL", c)
+        for c in [
+            "miami",
+            "hialeah",
+            "fort lauderdale",
+            "boca raton",
+            "west palm beach",
+        ]
+    ],
+    "research triangle": [("NC", c) for c in ["raleigh", "durham", "cary"]],
+}
+
+US_COUNTRY_NAMES = {"united states", "united states of america", "usa", "us", "america"}
+OTHER_COUNTRY_NAMES = {
+    "canada", "mexico", "united kingdom", "uk", "england", "scotland", "wales",
+    "ireland", "australia", "new zealand", "india", "germany", "france", "spain",
+    "italy", "netherlands", "brazil", "philippines", "south africa", "singapore",
+    "united arab emirates", "uae", "israel", "japan", "china", "sweden", "norway",
+    "denmark", "poland", "portugal", "switzerland", "belgium", "argentina",
+    "colombia", "chile", "nigeria", "pakistan",
+}  # fmt: skip
+
+_NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+_GREATER_PREFIX = re.compile(r"^(greater|metro|the) ")
+_AREA_SUFFIX = re.compile(r" (area|metro|metropolitan area|metroplex|region)$")
+_ZIP_PATTERN = re.compile(r"\b\d{5}(?:-\d{4})?\b")
+_STATE_BY_NAME = {name: code for code, name in US_STATES.items()}
+# Spellings of a state code that don't survive normalization ("D.C." -> "d c")
+_STATE_CODE_ALIASES = {"d c": "DC", "washington dc": "DC", "washington d c": "DC"}
+_STATES_BY_CITY: Dict[str, Set[str]] = {}
+for _state, _cities in US_CITIES.items():
+    for _city in _cities:
+        _STATES_BY_CITY.setdefault(_city, set()).add(_state)
+
+
+def _normalize(text: str) -> str:
+    text = text.lower().replace("saint ", "st ").replace("st. ", "st ")
+    return " ".join(_NON_WORD_PATTERN.sub(" ", text).split())
+
+
+def _as_state_code(part: str) -> Optional[str]:
+    if part in _STATE_CODE_ALIASES:
+        return _STATE_CODE_ALIASES[part]
+    # A two-letter code only counts as the whole part once the ZIP is stripped
+    # ("Austin, TX 78701"), never as the first word of a city ("La Jolla")
+    if len(part) == 2 and part.upper() in US_STATES:
+        return part.upper()
+    return None
+
+
+def _as_metro(part: str) -> Optional[str]:
+    for candidate in (part, _AREA_SUFFIX.sub("", _GREATER_PREFIX.sub("", part))):
+        if candidate in US_METROS:
+            return candidate
+        if f"greater {candidate}" in US_METROS:
+            return f"greater {candidate}"
+    return None
+
+
+def parse_location(location: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    Resolve a free-text location ("Austin, TX 78701", "Dallas, Texas, United
+    States", "London, UK") into country / state / city / metro parts. Parts it
+    can't resolve are None.
+    """
+    parsed: Dict[str, Optional[str]] = {
+        "country": None,
+        "state": None,
+        "city": None,
+        "metro": None,
+    }
+    parts = [_normalize(p) for p in _ZIP_PATTERN.sub("", location or "").split(",")]
+
+    # An explicit state code wins over state names, and a later state name over
+    # an earlier one, so "Washington, DC" is DC and "Seattle, Washington" is WA
+    codes, names, unresolved = [], [], []
+    for part in parts:
+        if not part:
+            continue
+        if part in US_COUNTRY_NAMES:
+            parsed["country"] = "US"
+        elif part in OTHER_COUNTRY_NAMES:
+            parsed["country"] = part
+        elif _as_state_code(part):
+            codes.append(_as_state_code(part))
+        elif part in _STATE_BY_NAME:
+            names.append(part)
+        else:
+            unresolved.append(part)
+
+    state_name = None
+    if codes:
+        parsed["state"] = codes[-1]
+    elif names:
+        state_name = names.pop()
+        parsed["state"] = _STATE_BY_NAME[state_name]
+    for name in names:
+        # Any other state name is a city of the chosen state when the gazetteer
+        # knows one ("Washington, DC"); otherwise it repeats the state or names a
+        # town we don't know ("Indiana, PA") and is dropped
+        if parsed["state"] in _STATES_BY_CITY.get(name, set()):
+            unresolved.insert(0, name)
+
+    if (
+        state_name
+        and not unresolved
+        and _STATES_BY_CITY.get(state_name, set()) - {parsed["state"]}
+    ):
+        # A lone "Washington" could be the state or the city in DC: don't guess
+        return {key: None for key in parsed}
+
+    # Cities win over metros so "Houston, TX" is the city, not Greater Houston
+    for part in unresolved:
+        states = _STATES_BY_CITY.get(part, set())
+        if parsed["city"] is None and parsed["state"] in states:
+            parsed["city"] = part
+        elif parsed["city"] is None and parsed["state"] is None and len(states) == 1:
+            parsed["city"], parsed["state"] = part, next(iter(states))
+        elif parsed["metro"] is None and not states and _as_metro(part):
+            parsed["metro"] = _as_metro(part)
+
+    if parsed["state"] or parsed["metro"]:
+        parsed["country"] = parsed["country"] or "US"
+    return parsed
+
+
+def parse_area(area: str) -> Optional[Dict[str, object]]:
+    """
+    Resolve one whitelist entry into the set of states, (state, city) pairs and
+    countries it covers, or None when the entry isn't in the gazetteer.
+    """
+    part = _normalize(area)
+    if not part:
+        return None
+    if part in US_COUNTRY_NAMES:
+        return {"countries": {"US"}, "states": set(), "cities": set()}
+    if part in OTHER_COUNTRY_NAMES:
+        return {"countries": {part}, "states": set(), "cities": set()}
+    metro = _as_metro(part)
+    if metro:
+        return {"countries": set(), "states": set(), "cities": set(US_METROS[metro])}
+
+    parsed = parse_location(area)
+    if parsed["city"]:
+        return {
+            "countries": set(),
+            "states": set(),
+            "cities": {(parsed["state"], parsed["city"])},
+        }
+    head = _normalize(area.split(",")[0])
+    if parsed["state"] and (
+        head in (US_STATES[parsed["state"]], parsed["state"].lower())
+        or _STATE_CODE_ALIASES.get(head) == parsed["state"]
+    ):
+        return {"countries": set(), "states": {parsed["state"]}, "cities": set()}
+    return None
+
+
+def match_locations(values: List[str], items: str) -> Dict[str, Optional[bool]]:
+    """
+    Decide offline whether each location lies within any semicolon-separated
+    whitelisted area. True / False when the gazetteer can tell; None for
+    unparseable locations or areas, which should fall through to the model.
+    """
+    areas = [parse_area(a) for a in items.split(";") if a.strip()]
+    if not values:
+        return {}
+    if not areas or any(a is None for a in areas):
+        return {value: None for value in values}
+
+    countries = set().union(*(a["countries"] for a in areas))
+    states = set().union(*(a["states"] for a in areas))
+    cities = set().union(*(a["cities"] for a in areas))
+    city_states = {state for state, _ in cities}
+
+    parsed = pd.DataFrame([parse_location(v) for v in values], index=values)
+    metro_cities = parsed["metro"].map(
+        lambda m: set(US_METROS[m]) if isinstance(m, str) else set()
+    )
+    metro_states = metro_cities.map(lambda members: {state for state, _ in members})
+    city_keys = pd.Series(
+        list(zip(parsed["state"], parsed["city"])), index=parsed.index
+    )
+
+    inside = (
+        parsed["country"].isin(countries)
+        | parsed["state"].isin(states)
+        | city_keys.isin(cities)
+        | metro_cities.map(lambda members: bool(members) and members <= cities)
+        | metro_states.map(lambda m: bool(m) and m <= states)
+    )
+    known = parsed["country"].notna()
+    # A US lead whose state has whitelisted cities but whose city is unknown (or
+    # a metro that only partly overlaps) can't be decided offline
+    ambiguous = (
+        ~inside
+        & parsed["state"].isin(city_states)
+        & (parsed["city"].isna() | parsed["metro"].notna())
+    ) | (
+        ~inside
+        & parsed["state"].isna()
+        & (
+            metro_cities.map(lambda members: bool(members & cities))
+            | metro_states.map(lambda m: bool(m & states))
+        )
+    )
+
+    decided = known & ~ambiguous
+    return {
+        value: (bool(inside[value]) if decided[value] else None) for value in values
+    }
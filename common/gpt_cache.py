@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from cachetools import LRUCache
+
+GPT_CACHE_PATH = os.environ.get(
+    "GPT_CACHE_PATH", os.path.join(".cache", "gpt_answers.sqlite3")
+)
+GPT_CACHE_MAX_ENTRIES = 200_000
+GPT_CACHE_MEMORY_ENTRIES = 20_000
+# Only check the table size every N inserts so writes stay cheap
+GPT_CACHE_EVICTION_INTERVAL = 1_000
+# Disk hits refresh last_used in a buffer, written with the next insert or
+# eviction (or once this many are pending) instead of one commit per lookup
+GPT_CACHE_TOUCH_FLUSH_SIZE = 500
+
+
+def gpt_cache_key(
+    model: str, temperature: float, system_prompt: str, user_prompt: str
+) -> str:
+    raw = "\x1f".join([model, repr(float(temperature)), system_prompt, user_prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class GptAnswerCache:
+    """
+    Persistent GPT answer cache: an in-memory LRU in front of a SQLite table on
+    local disk. The table is trimmed to max_entries, least recently used first.
+    """
+
+    def __init__(
+        self,
+        path: str = GPT_CACHE_PATH,
+        max_entries: int = GPT_CACHE_MAX_ENTRIES,
+        memory_entries: int = GPT_CACHE_MEMORY_ENTRIES,
+    ):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self._memory: LRUCache = LRUCache(maxsize=memory_entries)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS gpt_answers (
+                key TEXT PRIMARY KEY,
+                answer TEXT NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS gpt_answers_last_used ON gpt_answers (last_used)"
+        )
+        self._conn.commit()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._inserts_since_eviction = 0
+        self._pending_touches: Dict[str, float] = {}
+        self._evict()
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            answer = self._memory.get(key)
+            if answer is not None:
+                self.memory_hits += 1
+                return answer
+
+            row = self._conn.execute(
+                "SELECT answer FROM gpt_answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._pending_touches[key] = time.time()
+            if len(self._pending_touches) >= GPT_CACHE_TOUCH_FLUSH_SIZE:
+                self._flush_touches()
+                self._conn.commit()
+            self._memory[key] = row[0]
+            self.disk_hits += 1
+            return row[0]
+
+    def set(self, key: str, answer: str) -> None:
+        with self._lock:
+            self._memory[key] = answer
+            self._flush_touches()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO gpt_answers (key, answer, last_used) VALUES (?, ?, ?)",
+                (key, answer, time.time()),
+            )
+            self._inserts_since_eviction += 1
+            if self._inserts_since_eviction >= GPT_CACHE_EVICTION_INTERVAL:
+                self._evict()
+            self._conn.commit()
+
+    def _flush_touches(self) -> None:
+        if not self._pending_touches:
+            return
+        self._conn.executemany(
+            "UPDATE gpt_answers SET last_used = ? WHERE key = ?",
+            [(used, key) for key, used in self._pending_touches.items()],
+        )
+        self._pending_touches.clear()
+
+    def _evict(self) -> None:
+        self._flush_touches()
+        self._inserts_since_eviction = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM gpt_answers").fetchone()
+        if count <= self.max_entries:
+            return
+        overflow = count - self.max_entries
+        self._conn.execute(
+            """
+            DELETE FROM gpt_answers WHERE key IN (
+                SELECT key FROM gpt_answers ORDER BY last_used LIMIT ?
+            )
+            """,
+            (overflow,),
+        )
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+
+_gpt_answer_cache: Optional[GptAnswerCache] = None
+_gpt_answer_cache_lock = threading.Lock()
+
+
+def get_or_create_gpt_answer_cache() -> GptAnswerCache:
+    global _gpt_answer_cache
+    with _gpt_answer_cache_lock:
+        if _gpt_answer_cache is None:
+            _gpt_answer_cache = GptAnswerCache()
+        return _gpt_answer_cache
@@ -0,0 +1,135 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+# USD per million tokens: (input, cached input, output). Update when pricing changes
+GPT_PRICING_PER_MILLION_TOKENS = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+}
+
+# Copied into asyncio tasks and to_thread workers, so calls made anywhere inside
+# a page run land in that run's log
+_current_gpt_run: contextvars.ContextVar[Optional["GptRunTelemetry"]] = (
+    contextvars.ContextVar("current_gpt_run", default=None)
+)
+
+
+def gpt_call_cost(
+    model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int
+) -> Optional[float]:
+    pricing = next(
+        (
+            price
+            for name, price in sorted(
+                GPT_PRICING_PER_MILLION_TOKENS.items(), key=lambda kv: -len(kv[0])
+            )
+            if model.startswith(name)
+        ),
+        None,
+    )
+    if pricing is None:
+        return None
+    input_price, cached_price, output_price = pricing
+    return (
+        (prompt_tokens - cached_tokens) * input_price
+        + cached_tokens * cached_price
+        + completion_tokens * output_price
+    ) / 1_000_000
+
+
+class GptRunTelemetry:
+    """Per-call log of the chat completions made during one page run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls: List[dict] = []
+        self.started = time.monotonic()
+
+    def record(self, call: dict) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self.calls)
+
+    def summary(self) -> Dict[str, float]:
+        calls = self.to_frame()
+        if calls.empty:
+            return {"calls": 0}
+        latency = calls["latency_seconds"]
+        return {
+            "calls": len(calls),
+            "errors": int(calls["error"].notna().sum()),
+            "retries": int(calls["retries"].sum()),
+            "prompt_tokens": int(calls["prompt_tokens"].sum()),
+            "cached_tokens": int(calls["cached_tokens"].sum()),
+            "completion_tokens": int(calls["completion_tokens"].sum()),
+            "cost_usd": float(calls["cost_usd"].sum()),
+            "latency_p50": float(latency.quantile(0.5)),
+            "latency_p95": float(latency.quantile(0.95)),
+            "wall_seconds": time.monotonic() - self.started,
+        }
+
+    def summary_text(self) -> str:
+        s = self.summary()
+        if not s["calls"]:
+            return "No GPT calls this run"
+        cached_share = s["cached_tokens"] / max(s["prompt_tokens"], 1)
+        models = self.to_frame()["model"].value_counts()
+        return (
+            f"{s['calls']} GPT calls ("
+            + ", ".join(f"{model}: {count}" for model, count in models.items())
+            + f"), {s['retries']} retries, {s['errors']} errors · "
+            f"{s['prompt_tokens']} prompt tokens ({cached_share:.0%} cached), "
+            f"{s['completion_tokens']} completion tokens · ~${s['cost_usd']:.4f} · "
+            f"latency p50 {s['latency_p50']:.2f}s / p95 {s['latency_p95']:.2f}s "
+            f"over {s['wall_seconds']:.1f}s"
+        )
+
+
+def record_gpt_call(
+    model: str,
+    usage,
+    latency_seconds: float,
+    retries: int = 0,
+    error: Optional[str] = None,
+) -> dict:
+    """Log one chat completion to the current page run, if there is one."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    cached_tokens = getattr(details, "cached_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    call = {
+        "timestamp": time.time(),
+        "model": model,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "completion_tokens": completion_tokens,
+        "latency_seconds": latency_seconds,
+        "retries": retries,
+        "cost_usd": gpt_call_cost(
+            model, prompt_tokens, cached_tokens, completion_tokens
+        ),
+        "error": error,
+    }
+    run = _current_gpt_run.get()
+    if run is not None:
+        run.record(call)
+    return call
+
+
+@contextmanager
+def gpt_telemetry_run() -> Iterator[GptRunTelemetry]:
+    """Collect every chat completion made inside the block into one run log."""
+    run = GptRunTelemetry()
+    token = _current_gpt_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_gpt_run.reset(token)
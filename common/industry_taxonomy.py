@@ -0,0 +1,264 @@
+import re
+from typing import Dict, List, Optional, Set
+
+# Compact NAICS-style taxonomy: code -> keywords (already normalized). Codes are
+# hierarchical, so "238" (specialty trade contractors) contains "23816" (roofing).
+# Every code is one concept and its keywords are synonyms; distinct trades that
+# NAICS lumps into one code (plumbing and HVAC) get their own child codes.
+INDUSTRY_TAXONOMY: Dict[str, List[str]] = {
+    "11": ["agriculture", "farming", "farm"],
+    "1121": ["ranch", "ranching"],
+    "113": ["forestry"],
+    "1141": ["fishing"],
+    "21": ["mining"],
+    "211": ["oil and gas"],
+    "2123": ["quarry"],
+    "22": ["utility", "utilities"],
+    "2211": ["power generation"],
+    "221114": ["solar farm", "solar power generation"],
+    "2213": ["water utility"],
+    "23": ["construction", "builder", "contractor", "general contractor"],
+    "236": ["home builder", "homebuilder", "residential construction"],
+    "236118": ["remodeling", "remodeler"],
+    "237": ["civil engineering construction"],
+    "2373": ["road construction", "paving"],
+    "238": ["specialty trade contractor"],
+    "23811": ["concrete"],
+    "238111": ["foundation repair"],
+    "23813": ["framing"],
+    "23814": ["masonry"],
+    "23816": ["roofing", "roofer", "roof repair", "roof"],
+    "23817": ["siding"],
+    "23818": ["gutter"],
+    "23821": ["electrical", "electrician"],
+    "238211": ["solar installer", "solar installation"],
+    "238221": ["plumbing", "plumber"],
+    "238222": ["hvac", "heating and air", "air conditioning", "heating"],
+    "238311": ["drywall"],
+    "238312": ["insulation"],
+    "23832": ["painting", "painter"],
+    "23833": ["flooring"],
+    "23835": ["carpentry", "carpenter"],
+    "238351": ["cabinetry"],
+    "23891": ["site preparation"],
+    "238911": ["demolition"],
+    "238912": ["excavation"],
+    "238991": ["pool construction"],
+    "238992": ["fencing"],
+    "31": ["manufacturing", "manufacturer", "factory"],
+    "42": ["wholesale", "distributor", "distribution"],
+    "44": ["retail"],
+    "4411": ["car dealership", "auto dealership", "car dealer"],
+    "4499": ["ecommerce", "e commerce"],
+    "48": ["transportation", "logistics", "freight"],
+    "4841": ["trucking", "truck transportation"],
+    "512": ["media"],
+    "5131": ["publishing"],
+    "5132": ["software", "saas", "software publisher"],
+    "517": ["telecommunication", "telecom", "internet provider"],
+    "52": ["finance", "financial service"],
+    "5221": ["banking"],
+    "5222": ["lending", "lender", "loan"],
+    "522292": ["mortgage"],
+    "5239": ["investment management", "wealth management", "financial advisor"],
+    "524": ["insurance"],
+    "5242": ["insurance agency", "insurance broker"],
+    "53": ["real estate"],
+    "5312": ["realtor", "real estate agent"],
+    "53131": ["property management"],
+    "5321": ["car rental"],
+    "5324": ["equipment rental"],
+    "54": ["professional service", "consulting", "consultant"],
+    "5411": ["legal", "law firm", "lawyer", "attorney"],
+    "5412": ["accounting", "accountant", "cpa"],
+    "541213": ["tax preparation"],
+    "541219": ["bookkeeping"],
+    "54131": ["architecture", "architect"],
+    "54133": ["engineering", "engineer"],
+    "54141": ["interior design"],
+    "54143": ["graphic design"],
+    "5415": ["it service", "information technology", "managed service", "msp"],
+    "5416": ["management consulting"],
+    "541612": ["hr consulting"],
+    "5418": ["marketing", "advertising", "marketing agency"],
+    "54181": ["digital marketing"],
+    "541811": ["seo"],
+    "54192": ["photography", "photographer"],
+    "54194": ["veterinary", "veterinarian"],
+    "56": ["administrative service", "support service"],
+    "5613": ["staffing", "recruiting", "recruitment", "employment agency"],
+    "56171": ["pest control"],
+    "56172": ["cleaning", "janitorial"],
+    "56173": ["landscaping", "lawn care"],
+    "562": ["waste management", "waste"],
+    "5621": ["junk removal"],
+    "61": ["education"],
+    "6111": ["school"],
+    "61169": ["tutoring"],
+    "62": ["healthcare", "health care", "medical"],
+    "6211": ["physician", "doctor", "medical practice"],
+    "6212": ["dental", "dentist", "dentistry"],
+    "62121": ["orthodontist", "orthodontic"],
+    "62131": ["chiropractor", "chiropractic"],
+    "62132": ["optometrist", "optometry"],
+    "62134": ["physical therapy", "physical therapist"],
+    "6216": ["home health", "home care"],
+    "623": ["nursing home"],
+    "6233": ["assisted living", "senior living"],
+    "624": ["social service"],
+    "6244": ["child care", "daycare"],
+    "71": ["entertainment", "recreation"],
+    "71394": ["fitness", "gym"],
+    "713941": ["yoga"],
+    "713942": ["pilates"],
+    "72": ["hospitality"],
+    "721": ["accommodation"],
+    "7211": ["hotel", "motel", "lodging"],
+    "722": ["food service"],
+    "72232": ["catering"],
+    "7225": ["restaurant"],
+    "722515": ["cafe", "coffee shop"],
+    "81": ["other service"],
+    "8111": ["auto repair", "automotive repair", "car repair", "mechanic"],
+    "811121": ["auto body"],
+    "8121": ["beauty", "personal care", "salon"],
+    "812111": ["barber", "barbershop"],
+    "812112": ["hair salon", "beauty salon"],
+    "812113": ["nail salon"],
+    "81219": ["spa", "day spa"],
+    "812199": ["med spa"],
+    "8122": ["funeral home"],
+    "81222": ["cemetery"],
+    "8131": ["church", "religious organization"],
+    "8133": ["nonprofit", "non profit", "charity"],
+    "92": ["government", "public administration"],
+}
+
+# Keywords too generic to count inside a longer phrase ("law enforcement",
+# "food bank", "dog training"); they only match an industry that is exactly
+# the keyword
+WHOLE_VALUE_KEYWORDS: Dict[str, str] = {
+    "art": "71",
+    "bank": "5221",
+    "bar": "7224",
+    "clinic": "62",
+    "health": "62",
+    "investment": "5239",
+    "law": "5411",
+    "shop": "44",
+    "store": "44",
+    "training": "61",
+}
+
+_MAX_KEYWORD_WORDS = 4
+_NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+_KEEP_TRAILING_S = ("ss", "us", "is", "ics")
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(_KEEP_TRAILING_S):
+        return word[:-1]
+    return word
+
+
+def normalize_industry(text: Optional[str]) -> str:
+    """Lowercase, spell out '&', drop punctuation and naive plurals."""
+    text = (text or "").lower().replace("&", " and ")
+    words = _NON_WORD_PATTERN.sub(" ", text).split()
+    return " ".join(_singular(w) for w in words)
+
+
+def _build_keyword_index() -> Dict[str, str]:
+    index: Dict[str, str] = {}
+    for code, keywords in INDUSTRY_TAXONOMY.items():
+        for keyword in keywords:
+            keyword = normalize_industry(keyword)
+            if index.setdefault(keyword, code) != code:
+                raise RuntimeError(f"Industry keyword {keyword!r} has two codes")
+    return index
+
+
+_KEYWORD_INDEX = _build_keyword_index()
+
+
+def _keyword_code(normalized: str) -> Optional[str]:
+    """Code of a whole normalized industry string that is itself a keyword."""
+    return WHOLE_VALUE_KEYWORDS.get(normalized) or _KEYWORD_INDEX.get(normalized)
+
+
+def industry_codes(text: Optional[str]) -> Set[str]:
+    """
+    Taxonomy codes for an industry string, from the longest keyword phrases it
+    contains (word n-gram lookups, so this is O(words)). Words inside a longer
+    match don't count again, so "nail salon" is not also a "salon".
+    """
+    normalized = normalize_industry(text)
+    if normalized in WHOLE_VALUE_KEYWORDS:
+        return {WHOLE_VALUE_KEYWORDS[normalized]}
+    words = normalized.split()
+    used = [False] * len(words)
+    codes: Set[str] = set()
+    for size in range(min(_MAX_KEYWORD_WORDS, len(words)), 0, -1):
+        for i in range(len(words) - size + 1):
+            if any(used[i : i + size]):
+                continue
+            code = _KEYWORD_INDEX.get(" ".join(words[i : i + size]))
+            if code:
+                codes.add(code)
+                used[i : i + size] = [True] * size
+    # "roofing contractor" hits both 23 and 23816; keep only the most specific
+    return {c for c in codes if not any(o != c and o.startswith(c) for o in codes)}
+
+
+def match_industry_list(industry: Optional[str], items: str) -> Optional[bool]:
+    """
+    Decide offline whether industry matches any entry of the semicolon list.
+
+    True when the normalized strings are equal, are synonyms (keywords of the
+    same code), or every taxonomy code of the industry falls strictly under
+    some entry's code (roofing under construction). False only when both sides
+    resolve to taxonomy codes and none are related. None when it can't tell,
+    e.g. an unknown term, the same code reached through different wording
+    ("roofing company" against "roofer"), an industry broader than an entry,
+    or one that mixes a listed topic with an unlisted one ("marketing agency
+    for dentists" against "dental").
+    """
+    value = normalize_industry(industry)
+    entries = [normalize_industry(e) for e in items.split(";")]
+    entries = [e for e in entries if e]
+    if not value or not entries:
+        return None
+    if value in entries:
+        return True
+    value_code = _keyword_code(value)
+    if value_code and any(_keyword_code(e) == value_code for e in entries):
+        return True
+
+    value_codes = industry_codes(value)
+    if not value_codes:
+        return None
+
+    entry_codes: Set[str] = set()
+    undecided = False
+    for entry in entries:
+        codes = industry_codes(entry)
+        if not codes:
+            undecided = True
+        entry_codes |= codes
+
+    if all(any(v != e and v.startswith(e) for e in entry_codes) for v in value_codes):
+        return True
+    if any(
+        v.startswith(e) or e.startswith(v) for v in value_codes for e in entry_codes
+    ):
+        # Partly covered, the same code in other words, or broader than an
+        # entry; leave it to the model
+        return None
+    return None if undecided else False
+
+
+def match_industry_values(values: List[str], items: str) -> Dict[str, Optional[bool]]:
+    """match_industry_list for many values at once (the rule-stage interface)."""
+    return {value: match_industry_list(value, items) for value in values}
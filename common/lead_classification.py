@@ -0,0 +1,634 @@
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from common.embeddings import cosine_similarity_matrix, get_embeddings_async
+from common.gpt_cache import get_or_create_gpt_answer_cache, gpt_cache_key
+from common.gpt_telemetry import GPT_PRICING_PER_MILLION_TOKENS
+from common.gazetteer import match_locations
+from common.industry_taxonomy import match_industry_values
+from common.openai_batch import run_chat_batch
+from common.utils import (
+    GPT_MAX_CONCURRENCY,
+    GPT_MODEL,
+    GPT_SMALL_MODEL,
+    chunk_list,
+    get_gpt_answer_async,
+    get_gpt_answer_with_confidence_async,
+    get_gpt_json_answer_async,
+    get_or_create_gpt_concurrency_limiter,
+)
+
+CLASSIFICATION_BATCH_SIZE = 25
+
+# OpenAI only caches prompt prefixes of at least 1024 tokens. Batch system
+# prompts are padded to PROMPT_CACHE_PADDED_TOKENS (20% past the minimum, since
+# the token count is only estimated) only when the padded prefix billed at the
+# cached rate costs no more than the unpadded one at the full rate; below
+# PROMPT_CACHE_PAD_FROM_TOKENS padding loses money even on every cache hit
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_PADDED_TOKENS = int(PROMPT_CACHE_MIN_TOKENS * 1.2)
+_input_price, _cached_price, _ = GPT_PRICING_PER_MILLION_TOKENS[GPT_MODEL]
+PROMPT_CACHE_PAD_FROM_TOKENS = math.ceil(
+    PROMPT_CACHE_PADDED_TOKENS * _cached_price / _input_price
+)
+CHARS_PER_TOKEN = 4
+
+# Cosine similarity bands for the embedding prefilter: at or above the high
+# threshold a value clearly matches a list entry, at or below the low one it
+# clearly matches none; only the band in between goes to GPT.
+EMBEDDING_MATCH_THRESHOLD = 0.75
+EMBEDDING_NO_MATCH_THRESHOLD = 0.30
+
+# GPT_SMALL_MODEL answers first; verdicts below this confidence go to GPT_MODEL
+CASCADE_CONFIDENCE_THRESHOLD = 0.9
+
+# Each check asks a yes/no question about one value against a semicolon list;
+# a lead is removed when the answer equals remove_on. rule_matcher(values, items)
+# returns value -> True/False ("yes"/"no") or None when it can't decide offline.
+LEAD_CHECKS: Dict[str, Dict[str, Any]] = {
+    "outside_whitelisted_area": {
+        "system": (
+            "You are a helpful assistant that filters addresses based on whitelisted areas. "
+            "The whitelisted areas are:\n{items}"
+        ),
+        "prompt": (
+            "Is the address {value} located within any of the whitelisted areas? "
+            "You answer should strictly be 'yes' or 'no'"
+        ),
+        "batch_question": "Is the address located within any of the whitelisted areas?",
+        "remove_on": "no",
+        "temperature": 0.7,
+        "rule_matcher": match_locations,
+    },
+    "in_blocklisted_industry": {
+        "system": (
+            "You are a helpful assistant that filters industries based on blocklisted industries:\n{items}"
+        ),
+        "prompt": (
+            "Does the industry {value} match any of the blocklisted industries? "
+            "Answer strictly 'yes' or 'no'"
+        ),
+        "batch_question": "Does the industry match any of the blocklisted industries?",
+        "remove_on": "yes",
+        "temperature": 0.7,
+        "embedding_prefilter": True,
+        "rule_matcher": match_industry_values,
+    },
+    "outside_whitelisted_industry": {
+        "system": (
+            "You are a helpful assistant that filters industries based on whitelisted industries:\n{items}"
+        ),
+        "prompt": (
+            "Does the industry {value} stay within any of the whitelisted industries? "
+            "Answer strictly 'yes' or 'no'"
+        ),
+        "batch_question": "Does the industry stay within any of the whitelisted industries?",
+        "remove_on": "no",
+        "temperature": 0.2,
+        "embedding_prefilter": True,
+        "rule_matcher": match_industry_values,
+    },
+}
+
+
+def _verdicts_schema(name: str, with_confidence: bool = False) -> Dict[str, Any]:
+    verdict = {
+        "value": {"type": "string"},
+        "answer": {"type": "string", "enum": ["yes", "no"]},
+    }
+    if with_confidence:
+        verdict["confidence"] = {"type": "number"}
+    return {
+        "name": name,
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "verdicts": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": verdict,
+                        "required": list(verdict),
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["verdicts"],
+            "additionalProperties": False,
+        },
+    }
+
+
+VERDICTS_SCHEMA = _verdicts_schema("verdicts")
+# The small model also reports a confidence per verdict; the instruction goes
+# after the values so the cacheable prefix is shared with the large model
+VERDICTS_WITH_CONFIDENCE_SCHEMA = _verdicts_schema(
+    "verdicts_with_confidence", with_confidence=True
+)
+CONFIDENCE_INSTRUCTION = (
+    "\nAlso give your confidence in each answer, from 0 (a guess) to 1 (certain)."
+)
+
+
+def build_check_prompts(check: str, items: str, value: str) -> tuple[str, str]:
+    """System and user prompt for asking one check about a single value."""
+    spec = LEAD_CHECKS[check]
+    system = spec["system"].format(items=items.replace(";", "\n"))
+    return system, spec["prompt"].format(value=value)
+
+
+@lru_cache(maxsize=64)
+def _cacheable_batch_system_prompt(check: str, items: str, pad: bool = True) -> str:
+    # Everything that is the same for every batch of a check and list goes here,
+    # ahead of the values; long lists are padded past the prompt-cache minimum
+    spec = LEAD_CHECKS[check]
+    prompt = (
+        spec["system"].format(items=items.replace(";", "\n"))
+        + "\n\nYou will receive a JSON array of values. For each value, answer this "
+        f"question strictly with 'yes' or 'no': {spec['batch_question']}\n"
+        "Return one verdict per value, echoing the value exactly."
+    )
+    # Each " pad" is a single token
+    estimated_tokens = len(prompt) // CHARS_PER_TOKEN
+    missing = PROMPT_CACHE_PADDED_TOKENS - estimated_tokens
+    if pad and estimated_tokens >= PROMPT_CACHE_PAD_FROM_TOKENS and missing > 0:
+        prompt += "\n\nThe words below are padding; ignore them.\n"
+        prompt += " ".join(["pad"] * missing)
+    return prompt
+
+
+def build_batch_prompts(
+    check: str, items: str, values: List[str], pad_for_prompt_cache: bool = True
+) -> tuple[str, str]:
+    """
+    System and user prompt for asking one check about several values at once.
+    The system prompt is a stable, cacheable prefix; only the values vary.
+    """
+    return (
+        _cacheable_batch_system_prompt(check, items, pad_for_prompt_cache),
+        f"Values:\n{json.dumps(values, ensure_ascii=False)}",
+    )
+
+
+def _parse_verdicts(response: Any, values: List[str]) -> Dict[str, str]:
+    """Keep only well-formed verdicts for values that were actually asked about."""
+    expected = set(values)
+    answers: Dict[str, str] = {}
+    if not isinstance(response, dict) or not isinstance(response.get("verdicts"), list):
+        return answers
+    for verdict in response["verdicts"]:
+        if not isinstance(verdict, dict):
+            continue
+        value = verdict.get("value")
+        answer = str(verdict.get("answer", "")).strip().lower()
+        if value in expected and answer in ("yes", "no"):
+            answers[value] = answer
+    return answers
+
+
+async def _classify_batch(check: str, items: str, values: List[str]) -> Dict[str, str]:
+    spec = LEAD_CHECKS[check]
+    if len(values) == 1:
+        system, prompt = build_check_prompts(check, items, values[0])
+        answer = await get_gpt_answer_async(
+            system, prompt, spec["temperature"], use_cache=False
+        )
+        return {values[0]: (answer or "").strip().lower()}
+
+    system, prompt = build_batch_prompts(check, items, values)
+    try:
+        response = await get_gpt_json_answer_async(
+            system, prompt, VERDICTS_SCHEMA, spec["temperature"]
+        )
+    except ValueError:
+        response = None
+
+    answers = _parse_verdicts(response, values)
+    missing = [v for v in values if v not in answers]
+    if missing:
+        # Partial or malformed output: split what's left and ask again
+        mid = max(1, len(missing) // 2)
+        halves = [missing[:mid], missing[mid:]] if len(missing) > 1 else [missing]
+        for retried in await asyncio.gather(
+            *(_classify_batch(check, items, half) for half in halves if half)
+        ):
+            answers.update(retried)
+    return answers
+
+
+def _parse_confident_verdicts(
+    response: Any, values: List[str]
+) -> Dict[str, Tuple[str, float]]:
+    answers = _parse_verdicts(response, values)
+    confident: Dict[str, Tuple[str, float]] = {}
+    for verdict in response["verdicts"] if answers else []:
+        value = verdict.get("value") if isinstance(verdict, dict) else None
+        if value in answers and isinstance(verdict.get("confidence"), (int, float)):
+            confident[value] = (answers[value], float(verdict["confidence"]))
+    return confident
+
+
+def _record_tier(tier_stats: Dict, model: str, values: int, seconds: float) -> None:
+    stats = tier_stats.setdefault(model, {"batches": 0, "values": 0, "seconds": 0.0})
+    stats["batches"] += 1
+    stats["values"] += values
+    stats["seconds"] += seconds
+
+
+async def _classify_batch_cascade(
+    check: str,
+    items: str,
+    values: List[str],
+    threshold: float,
+    tier_stats: Dict,
+) -> Tuple[Dict[str, str], Dict[str, Tuple[str, Optional[float]]]]:
+    """
+    Ask GPT_SMALL_MODEL first and keep the answers it is at least threshold
+    confident in (token probability for a single value, self-reported for a
+    batch); everything else is escalated to GPT_MODEL through _classify_batch.
+    Returns the answers and, per value, the model that gave it with its
+    confidence (None for GPT_MODEL).
+    """
+    spec = LEAD_CHECKS[check]
+    started = time.monotonic()
+    confident: Dict[str, str] = {}
+    confidences: Dict[str, float] = {}
+    if len(values) == 1:
+        system, prompt = build_check_prompts(check, items, values[0])
+        answer, confidence = await get_gpt_answer_with_confidence_async(
+            system, prompt, spec["temperature"], model=GPT_SMALL_MODEL
+        )
+        if answer in ("yes", "no") and confidence >= threshold:
+            confident[values[0]] = answer
+            confidences[values[0]] = confidence
+    else:
+        system, prompt = build_batch_prompts(check, items, values)
+        try:
+            response = await get_gpt_json_answer_async(
+                system,
+                prompt + CONFIDENCE_INSTRUCTION,
+                VERDICTS_WITH_CONFIDENCE_SCHEMA,
+                spec["temperature"],
+                model=GPT_SMALL_MODEL,
+            )
+        except ValueError:
+            response = None
+        for value, (answer, confidence) in _parse_confident_verdicts(
+            response, values
+        ).items():
+            if confidence >= threshold:
+                confident[value] = answer
+                confidences[value] = confidence
+    _record_tier(
+        tier_stats, GPT_SMALL_MODEL, len(confident), time.monotonic() - started
+    )
+
+    answered_by = {
+        value: (GPT_SMALL_MODEL, confidence)
+        for value, confidence in confidences.items()
+    }
+    escalated = [value for value in values if value not in confident]
+    if not escalated:
+        return confident, answered_by
+    started = time.monotonic()
+    answers = await _classify_batch(check, items, escalated)
+    _record_tier(tier_stats, GPT_MODEL, len(answers), time.monotonic() - started)
+    answered_by.update(dict.fromkeys(answers, (GPT_MODEL, None)))
+    return {**confident, **answers}, answered_by
+
+
+async def _classify_batch_single_tier(
+    check: str, items: str, values: List[str]
+) -> Tuple[Dict[str, str], Dict[str, Tuple[str, Optional[float]]]]:
+    answers = await _classify_batch(check, items, values)
+    return answers, dict.fromkeys(answers, (GPT_MODEL, None))
+
+
+def format_tier_stats(tier_stats: Dict) -> str:
+    return ", ".join(
+        f"{model}: {stats['values']} values in {stats['batches']} batches "
+        f"({stats['seconds'] / max(stats['batches'], 1):.1f}s avg)"
+        for model, stats in tier_stats.items()
+    )
+
+
+async def prefilter_by_embedding(
+    items: str,
+    values: List[str],
+    thresholds: Tuple[float, float] = (
+        EMBEDDING_NO_MATCH_THRESHOLD,
+        EMBEDDING_MATCH_THRESHOLD,
+    ),
+) -> Dict[str, str]:
+    """
+    Answer "does value match any list entry" from embeddings where the answer is
+    clear: "yes" when the best cosine similarity is at or above the high
+    threshold, "no" at or below the low one. Ambiguous values are left out.
+    """
+    entries = [e.strip() for e in items.split(";") if e.strip()]
+    if not entries or not values:
+        return {}
+
+    low, high = thresholds
+    embeddings = await get_embeddings_async(entries + values)
+    similarity = cosine_similarity_matrix(
+        embeddings[len(entries) :], embeddings[: len(entries)]
+    )
+    best = similarity.max(axis=1)
+
+    answers = {}
+    for value, score in zip(values, best):
+        if score >= high:
+            answers[value] = "yes"
+        elif score <= low:
+            answers[value] = "no"
+    return answers
+
+
+def _decide_offline(
+    check: str,
+    items: str,
+    values: List[str],
+    cache,
+    cascade_threshold: Optional[float] = None,
+) -> Dict[str, str]:
+    """
+    Answers from the rule matcher and the GPT answer cache; no API calls.
+    Cached GPT_MODEL answers always count. With a cascade_threshold, cached
+    GPT_SMALL_MODEL answers count too when their stored confidence meets it.
+    """
+    spec = LEAD_CHECKS[check]
+    answers: Dict[str, str] = {}
+    undecided = values
+    rule_matcher = spec.get("rule_matcher")
+    if rule_matcher and values:
+        undecided = []
+        for value, matched in rule_matcher(values, items).items():
+            if matched is None:
+                undecided.append(value)
+            else:
+                answers[value] = "yes" if matched else "no"
+
+    for value in undecided:
+        cached: Optional[str] = cache.get(_cache_key(check, items, value))
+        if cached is None and cascade_threshold is not None:
+            cached = _small_model_answer(
+                cache.get(_cache_key(check, items, value, GPT_SMALL_MODEL)),
+                cascade_threshold,
+            )
+        if cached is not None:
+            answers[value] = cached
+    return answers
+
+
+def _cache_key(check: str, items: str, value: str, model: str = GPT_MODEL) -> str:
+    return gpt_cache_key(
+        model,
+        LEAD_CHECKS[check]["temperature"],
+        *build_check_prompts(check, items, value),
+    )
+
+
+def _cache_entry(answer: str, confidence: Optional[float]) -> str:
+    # GPT_MODEL answers are cached as plain text; small-model answers keep the
+    # confidence they were accepted with, so a stricter threshold can skip them
+    if confidence is None:
+        return answer
+    return json.dumps({"answer": answer, "confidence": confidence})
+
+
+def _small_model_answer(entry: Optional[str], threshold: float) -> Optional[str]:
+    try:
+        cached = json.loads(entry) if entry else None
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(cached, dict) or cached.get("confidence", 0) < threshold:
+        return None
+    return cached.get("answer")
+
+
+async def _classify_with_batch_api(
+    pending: Dict[str, Tuple[str, List[str]]],
+    batch_size: int,
+    backend=None,
+    on_progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Dict[str, str]]:
+    """check -> (items, values) answered through a single Batch API job."""
+    requests: Dict[str, dict] = {}
+    asked: Dict[str, Tuple[str, List[str]]] = {}
+    for check, (items, values) in pending.items():
+        for i, batch in enumerate(chunk_list(values, batch_size)):
+            # Batch jobs can't count on the prompt cache, so skip the padding
+            system, prompt = build_batch_prompts(
+                check, items, batch, pad_for_prompt_cache=False
+            )
+            custom_id = f"{check}-{i}"
+            requests[custom_id] = {
+                "model": GPT_MODEL,
+                "messages": [
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                "temperature": LEAD_CHECKS[check]["temperature"],
+                "response_format": {
+                    "type": "json_schema",
+                    "json_schema": VERDICTS_SCHEMA,
+                },
+            }
+            asked[custom_id] = (check, batch)
+
+    answers: Dict[str, Dict[str, str]] = {check: {} for check in pending}
+    contents = await run_chat_batch(requests, backend, on_progress=on_progress)
+    for custom_id, content in contents.items():
+        check, batch = asked[custom_id]
+        try:
+            response = json.loads(content) if content else None
+        except json.JSONDecodeError:
+            response = None
+        answers[check].update(_parse_verdicts(response, batch))
+    return answers
+
+
+async def classify_leads(
+    leads: pd.DataFrame,
+    checks: Dict[str, Tuple[str, str]],
+    batch_size: int = CLASSIFICATION_BATCH_SIZE,
+    concurrency: int = GPT_MAX_CONCURRENCY,
+    embedding_thresholds: Optional[Tuple[float, float]] = None,
+    on_progress: Optional[Callable[[str], None]] = None,
+    use_batch_api: bool = False,
+    batch_backend=None,
+    cascade_threshold: Optional[float] = CASCADE_CONFIDENCE_THRESHOLD,
+    tier_stats: Optional[Dict] = None,
+) -> Dict[str, Dict[str, bool]]:
+    """
+    Run several checks over the distinct values of a leads frame. checks maps
+    check name -> (column, semicolon list). Returns check -> value -> whether a
+    lead with that value should be removed.
+
+    Stages run cheapest first, each over every check before the next starts:
+    1. Offline: rule_matcher (taxonomy matches for industries, gazetteer
+       containment for locations), then answers GPT already gave (by either
+       path) from the GPT answer cache under their single-value prompt key and
+       the model that answered (GPT_SMALL_MODEL answers only with the cascade).
+    2. The embedding prefilter, for checks that have one, decides values whose
+       similarity to the list is clearly high or low; embedding_thresholds
+       overrides the (low, high) band.
+    3. GPT, up to batch_size values per request with a JSON-schema response.
+       Requests for all checks share a sliding window of concurrency in-flight
+       batches; each result is applied as soon as it lands. The adaptive GPT
+       limiter decides how many of those actually call the API at once.
+       With use_batch_api, every batch is first submitted as one OpenAI Batch
+       API job (batch_backend, e.g. LocalBatchBackend, replaces the real
+       endpoint); only values the job didn't answer go through the window.
+       Unless cascade_threshold is None, each window batch is a model cascade:
+       GPT_SMALL_MODEL first, escalating answers below that confidence to
+       GPT_MODEL. Per-model batch/value counts and time go into tier_stats.
+
+    After every decision, leads already marked for removal stop counting: a value
+    only held by removed leads is never sent, and in-flight requests whose values
+    are no longer needed are cancelled. Those values get no verdict.
+    """
+    cache = get_or_create_gpt_answer_cache()
+    tier_stats = {} if tier_stats is None else tier_stats
+    verdicts: Dict[str, Dict[str, bool]] = {check: {} for check in checks}
+    active = {check: spec for check, spec in checks.items() if spec[1]}
+    removed = pd.Series(False, index=leads.index)
+
+    def pending_values(check: str) -> List[str]:
+        column = checks[check][0]
+        alive = leads.loc[~removed, column].unique()
+        return [v for v in alive if v and v not in verdicts[check]]
+
+    def apply(check: str, answers: Dict[str, str]) -> None:
+        nonlocal removed
+        remove_on = LEAD_CHECKS[check]["remove_on"]
+        decided = {value: answer == remove_on for value, answer in answers.items()}
+        verdicts[check].update(decided)
+        to_remove = [value for value, remove in decided.items() if remove]
+        if to_remove:
+            removed = removed | leads[checks[check][0]].isin(to_remove)
+
+    def resolved_leads() -> pd.Series:
+        # A lead is settled once it is marked or every check has decided its value
+        decided = pd.Series(True, index=leads.index)
+        for check in active:
+            column = leads[checks[check][0]]
+            decided &= column.isin(list(verdicts[check])) | ~column.astype(bool)
+        return removed | decided
+
+    def report(stage: str) -> None:
+        if on_progress:
+            on_progress(f"{stage}: {int(removed.sum())}/{len(leads)} leads marked")
+
+    for check, (_, items) in active.items():
+        apply(
+            check,
+            _decide_offline(
+                check,
+                items,
+                pending_values(check),
+                cache,
+                cascade_threshold,
+            ),
+        )
+    report("Offline rules and cache")
+
+    for check, (_, items) in active.items():
+        if LEAD_CHECKS[check].get("embedding_prefilter"):
+            apply(
+                check,
+                await prefilter_by_embedding(
+                    items,
+                    pending_values(check),
+                    embedding_thresholds
+                    or (EMBEDDING_NO_MATCH_THRESHOLD, EMBEDDING_MATCH_THRESHOLD),
+                ),
+            )
+    report("Embedding prefilter")
+
+    if use_batch_api:
+        for check, answers in (
+            await _classify_with_batch_api(
+                {
+                    check: (items, pending_values(check))
+                    for check, (_, items) in active.items()
+                },
+                batch_size,
+                batch_backend,
+                on_progress,
+            )
+        ).items():
+            for value, answer in answers.items():
+                cache.set(_cache_key(check, active[check][1], value), answer)
+            apply(check, answers)
+        report("Batch API")
+
+    # Sliding window: a new request starts as soon as any in-flight one finishes
+    queue = deque(
+        (check, batch)
+        for check, (_, items) in active.items()
+        for batch in chunk_list(pending_values(check), batch_size)
+    )
+    in_flight: Dict[asyncio.Task, Tuple[str, List[str]]] = {}
+    started = time.monotonic()
+    resolved_before = int(resolved_leads().sum())
+    while queue or in_flight:
+        while queue and len(in_flight) < concurrency:
+            check, batch = queue.popleft()
+            still_needed = set(pending_values(check))
+            batch = [value for value in batch if value in still_needed]
+            if batch:
+                task = asyncio.create_task(
+                    _classify_batch_single_tier(check, active[check][1], batch)
+                    if cascade_threshold is None
+                    else _classify_batch_cascade(
+                        check,
+                        active[check][1],
+                        batch,
+                        cascade_threshold,
+                        tier_stats,
+                    )
+                )
+                in_flight[task] = (check, batch)
+        if not in_flight:
+            break
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            check, batch = in_flight.pop(task)
+            answers, answered_by = task.result()
+            for value, answer in answers.items():
+                model, confidence = answered_by[value]
+                cache.set(
+                    _cache_key(check, active[check][1], value, model),
+                    _cache_entry(answer, confidence),
+                )
+            apply(check, answers)
+
+        # Any lead already marked for removal no longer needs its other checks
+        still_needed = {check: set(pending_values(check)) for check in active}
+        for task, (check, batch) in list(in_flight.items()):
+            if not still_needed[check].intersection(batch):
+                task.cancel()
+                del in_flight[task]
+
+        if on_progress:
+            resolved = int(resolved_leads().sum())
+            rate = (resolved - resolved_before) / max(time.monotonic() - started, 1e-6)
+            on_progress(
+                f"GPT classification: {resolved}/{len(leads)} leads resolved, "
+                f"{int(removed.sum())} marked ({rate:.1f} leads/s, "
+                f"{len(in_flight)} batches running, "
+                f"{get_or_create_gpt_concurrency_limiter().summary()})"
+            )
+
+    return verdicts
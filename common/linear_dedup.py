@@ -0,0 +1,131 @@
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from clients.linear.index import LINEAR_MAX_MUTATIONS_PER_REQUEST, remove_linear_tickets
+from common.near_duplicates import find_near_duplicate_issues, ticket_campaign_key
+
+AUTOMATED_TITLE_PATTERN = re.compile(
+    r"^\[AUTOMATED \| \d{4}-\d{2}-\d{2}\]: (.+?) \d{4}-\d{2}-\d{2}$"
+)
+
+
+def _updated_at(issue: Dict[str, Any]) -> datetime:
+    return datetime.fromisoformat(issue["updatedAt"].replace("Z", "+00:00"))
+
+
+def plan_linear_ticket_deduplication(
+    issues: List[Dict[str, Any]],
+    similarity_threshold: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Work out which tickets to delete without touching Linear.
+
+    Tickets are grouped by the core title of the automated title pattern; with a
+    similarity_threshold, MinHash near-duplicate clusters (over titles) are
+    merged into those groups too, but never across tickets for different
+    campaigns. The most recently updated ticket in each group is kept. Only
+    groups with duplicates are returned, as {"coreTitle", "keep", "remove",
+    "nearDuplicate"} dicts, so the result doubles as a dry-run preview.
+    nearDuplicate is True for groups that only exist because of a similarity
+    match; callers should have those confirmed before deleting them.
+    """
+    # Group key per issue: its core title, or its id when the pattern doesn't match
+    key_by_id: Dict[str, str] = {}
+    for issue in issues:
+        match = AUTOMATED_TITLE_PATTERN.match(issue["title"])
+        key_by_id[issue["id"]] = match.group(1) if match else issue["id"]
+
+    parent: Dict[str, str] = {}
+
+    def find(key: str) -> str:
+        while parent.get(key, key) != key:
+            key = parent[key]
+        return key
+
+    if similarity_threshold is not None:
+        # Campaigns per group, so a near-duplicate match can't join two
+        # campaigns' tickets through their exact-title groups
+        campaigns: Dict[str, Set[str]] = {}
+        for issue in issues:
+            campaign = ticket_campaign_key(issue)
+            if campaign is not None:
+                campaigns.setdefault(key_by_id[issue["id"]], set()).add(campaign)
+
+        for cluster in find_near_duplicate_issues(issues, similarity_threshold):
+            head = find(key_by_id[cluster[0]["id"]])
+            for issue in cluster[1:]:
+                other = find(key_by_id[issue["id"]])
+                if other == head:
+                    continue
+                merged = campaigns.get(head, set()) | campaigns.get(other, set())
+                if len(merged) > 1:
+                    continue
+                parent[other] = head
+                campaigns[head] = merged
+
+    title_map: Dict[str, List[Dict[str, Any]]] = {}
+    for issue in issues:
+        title_map.setdefault(find(key_by_id[issue["id"]]), []).append(issue)
+
+    plan = []
+    for core_title, tickets in title_map.items():
+        if len(tickets) < 2:
+            continue
+        tickets = sorted(tickets, key=_updated_at)
+        near_duplicate = len({key_by_id[t["id"]] for t in tickets}) > 1
+        if core_title in key_by_id:
+            # Near-duplicate group rooted at an issue id rather than a core title
+            core_title = tickets[-1]["title"]
+        plan.append(
+            {
+                "coreTitle": core_title,
+                "keep": tickets[-1],
+                "remove": tickets[:-1],
+                "nearDuplicate": near_duplicate,
+            }
+        )
+    return plan
+
+
+def execute_linear_ticket_deduplication(
+    plan: List[Dict[str, Any]],
+    max_workers: int = 4,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Delete every ticket listed in a deduplication plan.
+
+    Deletions are packed into batched mutations and a few batches run at once;
+    rate limiting is handled by the Linear client, which waits for the window to
+    reset. on_progress(done, total) is called from the calling thread, so it is
+    safe to update Streamlit widgets from it.
+    """
+    issue_ids = [t["id"] for group in plan for t in group["remove"]]
+    batches = [
+        issue_ids[i : i + LINEAR_MAX_MUTATIONS_PER_REQUEST]
+        for i in range(0, len(issue_ids), LINEAR_MAX_MUTATIONS_PER_REQUEST)
+    ]
+
+    closed = 0
+    errors: List[str] = []
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(remove_linear_tickets, batch) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                errors.append(str(e) or "Unknown error")
+            else:
+                for r in results:
+                    if isinstance(r, Exception):
+                        errors.append(str(r))
+                    else:
+                        closed += 1
+            done += 1
+            if on_progress:
+                on_progress(done, len(batches))
+
+    return {"closed": closed, "errors": errors}
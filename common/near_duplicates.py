@@ -0,0 +1,273 @@
+import random
+import re
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Prime just above 2**32 so (a * x) mod p fits in uint64 for 32-bit shingle hashes
+_MINHASH_PRIME = np.uint64(4294967311)
+# A bigram in more than this share of the documents (and at least
+# BOILERPLATE_MIN_DOCUMENTS of them) is template text ("scrape more leads
+# for") and is left out of the similarity
+BOILERPLATE_DOCUMENT_SHARE = 0.05
+BOILERPLATE_MIN_DOCUMENTS = 20
+
+_DATE_PATTERN = re.compile(r"\b\d{2,4}[-_/]\d{2}[-_/]\d{2,4}\b")
+_NON_WORD_PATTERN = re.compile(r"[^a-z0-9]+")
+_TITLE_TAG_PATTERN = re.compile(r"^\s*\[[^\]]*\]:?")
+_CAMPAIGN_ID_PATTERN = re.compile(r"email-campaign/(\d+)")
+_URL_PATTERN = re.compile(r"https?://\S+")
+
+
+def normalize_ticket_text(title: str) -> str:
+    """
+    Lowercase, drop the "[AUTOMATED | date]:" tag, dates and punctuation, and
+    collapse whitespace. Descriptions are left out: they are mostly a shared
+    template, which would make tickets for different campaigns look alike.
+    """
+    text = _TITLE_TAG_PATTERN.sub(" ", title or "").lower()
+    text = _DATE_PATTERN.sub(" ", text)
+    return _NON_WORD_PATTERN.sub(" ", text).strip()
+
+
+def ticket_campaign_key(issue: Dict[str, Any]) -> Optional[str]:
+    """The campaign a ticket is about: its Smartlead campaign id, else its first URL."""
+    description = issue.get("description") or ""
+    match = _CAMPAIGN_ID_PATTERN.search(description)
+    if match:
+        return match.group(1)
+    match = _URL_PATTERN.search(description)
+    return match.group(0).rstrip(".,)") if match else None
+
+
+def shingle(text: str, size: int = 2) -> np.ndarray:
+    """Hash the word n-grams of text to a deduplicated uint32 array."""
+    words = text.split()
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+    return np.unique(
+        np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64)
+    )
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    if not len(a) and not len(b):
+        return 1.0
+    shared = len(np.intersect1d(a, b, assume_unique=True))
+    return shared / (len(a) + len(b) - shared)
+
+
+def drop_boilerplate(shingle_sets: List[np.ndarray]) -> List[np.ndarray]:
+    """Remove the shingles shared by too many documents to tell them apart."""
+    if not shingle_sets:
+        return shingle_sets
+    hashes, counts = np.unique(np.concatenate(shingle_sets), return_counts=True)
+    limit = max(
+        BOILERPLATE_MIN_DOCUMENTS, BOILERPLATE_DOCUMENT_SHARE * len(shingle_sets)
+    )
+    boilerplate = hashes[counts > limit]
+    if not len(boilerplate):
+        return shingle_sets
+    return [s[~np.isin(s, boilerplate, assume_unique=True)] for s in shingle_sets]
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(_MINHASH_PRIME), size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, int(_MINHASH_PRIME), size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signatures(
+    shingle_sets: List[np.ndarray], num_perm: int = 128, seed: int = 1
+) -> np.ndarray:
+    """Return a (documents x num_perm) matrix of MinHash signatures."""
+    a, b = _permutations(num_perm, seed)
+    signatures = np.full(
+        (len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64
+    )
+    for i, hashes in enumerate(shingle_sets):
+        if len(hashes):
+            permuted = (np.outer(a, hashes) % _MINHASH_PRIME + b[:, None]) % (
+                _MINHASH_PRIME
+            )
+            signatures[i] = permuted.min(axis=1)
+    return signatures
+
+
+def lsh_band_layout(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) with bands * rows <= num_perm whose S-curve midpoint,
+    (1 / bands) ** (1 / rows), sits closest to the similarity threshold.
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+def find_near_duplicate_clusters(
+    documents: List[str],
+    threshold: float = 0.8,
+    num_perm: int = 128,
+    seed: int = 1,
+    keys: Optional[List[Optional[str]]] = None,
+) -> List[List[int]]:
+    """
+    Group documents whose estimated Jaccard similarity (over word bigrams, minus
+    boilerplate bigrams) is at least threshold. LSH banding keeps candidate
+    generation near-linear; each candidate pair is then confirmed with an exact
+    Jaccard check, so MinHash estimation noise can't merge unrelated tickets.
+    Documents whose keys differ (both not None) never end up in one cluster,
+    even through a chain of similar documents. Returns clusters of two or more
+    document indexes.
+    """
+    shingle_sets = drop_boilerplate([shingle(doc) for doc in documents])
+    signatures = minhash_signatures(shingle_sets, num_perm, seed)
+    bands, rows = lsh_band_layout(num_perm, threshold)
+
+    parent = list(range(len(documents)))
+    # Key of each cluster root, so a merge can't join two different keys
+    root_key = list(keys) if keys is not None else [None] * len(documents)
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    empty = np.iinfo(np.uint64).max
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        band_slice = signatures[:, band * rows : (band + 1) * rows]
+        for i, key in enumerate(band_slice):
+            if key[0] != empty:
+                buckets.setdefault(key.tobytes(), []).append(i)
+
+        for members in buckets.values():
+            # Compare each member with the first member of every other key seen
+            # in the bucket, so one campaign can't hide another's duplicates
+            heads: List[int] = []
+            for other in members:
+                for head in heads:
+                    head_root, other_root = find(head), find(other)
+                    if head_root == other_root:
+                        break
+                    head_key, other_key = root_key[head_root], root_key[other_root]
+                    if head_key is not None and other_key is not None:
+                        if head_key != other_key:
+                            continue
+                    if jaccard(shingle_sets[head], shingle_sets[other]) >= threshold:
+                        parent[other_root] = head_root
+                        root_key[head_root] = head_key or other_key
+                        break
+                else:
+                    heads.append(other)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(documents)):
+        clusters.setdefault(find(i), []).append(i)
+    return [c for c in clusters.values() if len(c) > 1]
+
+
+def find_near_duplicate_issues(
+    issues: List[Dict[str, Any]], threshold: float = 0.8
+) -> List[List[Dict[str, Any]]]:
+    documents = [normalize_ticket_text(issue.get("title")) for issue in issues]
+    keys = [ticket_campaign_key(issue) for issue in issues]
+    return [
+        [issues[i] for i in cluster]
+        for cluster in find_near_duplicate_clusters(documents, threshold, keys=keys)
+    ]
+
+
+def benchmark_near_duplicate_detection(
+    n_issues: int = 10_000, threshold: float = 0.8, seed: Optional[int] = 7
+) -> Dict[str, Any]:
+    """
+    Time near-duplicate detection on synthetic automated tickets and score it
+    against the injected duplicates: ~1 in 5 issues is a re-dated or lightly
+    reworded copy of another. Campaign names come from a small vocabulary, so
+    many distinct campaigns share a title and only differ by campaign URL, and
+    every description carries the same template text.
+    """
+    rng = random.Random(seed)
+    verbs = ["Scrape more leads for", "Scrape leads for", "Find more leads for"]
+    words = ["acme", "roofing", "dental", "plumbing", "solar", "legal", "hvac"]
+    template = (
+        "Please scrape a fresh batch of leads for this campaign. Follow the "
+        "targeting in the campaign settings, dedupe against existing leads, "
+        "upload the CSV to the campaign and move this ticket to review."
+    )
+
+    issues = []
+    origin = []
+    originals = []
+    for i in range(n_issues):
+        if originals and rng.random() < 0.2:
+            base_index = rng.choice(originals)
+            base = issues[base_index]
+            title = base["title"].replace(verbs[0], rng.choice(verbs[:2]))
+            title = re.sub(
+                r"\d{4}-\d{2}-\d{2}$", f"2024-02-{rng.randint(10, 28)}", title
+            )
+            issues.append(
+                {"id": str(i), "title": title, "description": base["description"]}
+            )
+            origin.append(base_index)
+            continue
+
+        name = " ".join(rng.choice(words) for _ in range(3))
+        issues.append(
+            {
+                "id": str(i),
+                "title": f"[AUTOMATED | 2024-01-{rng.randint(10, 28)}]: "
+                f"{verbs[0]} {name} by 2024-01-{rng.randint(10, 28)}",
+                "description": f"{template}\n\nCampaign URL: "
+                f"https://app.smartlead.ai/app/email-campaign/{i}/analytics",
+            }
+        )
+        origin.append(i)
+        originals.append(i)
+
+    started = time.perf_counter()
+    clusters = find_near_duplicate_issues(issues, threshold)
+    elapsed = time.perf_counter() - started
+
+    def pairs(n: int) -> int:
+        return n * (n - 1) // 2
+
+    found_pairs = sum(pairs(len(c)) for c in clusters)
+    true_found_pairs = 0
+    for cluster in clusters:
+        per_origin: Dict[int, int] = {}
+        for issue in cluster:
+            key = origin[int(issue["id"])]
+            per_origin[key] = per_origin.get(key, 0) + 1
+        true_found_pairs += sum(pairs(n) for n in per_origin.values())
+    group_sizes: Dict[int, int] = {}
+    for key in origin:
+        group_sizes[key] = group_sizes.get(key, 0) + 1
+    true_pairs = sum(pairs(n) for n in group_sizes.values())
+
+    return {
+        "issues": n_issues,
+        "clusters": len(clusters),
+        "duplicates": sum(len(c) - 1 for c in clusters),
+        "injected_duplicates": n_issues - len(originals),
+        "precision": round(true_found_pairs / found_pairs, 4) if found_pairs else 1.0,
+        "recall": round(true_found_pairs / true_pairs, 4) if true_pairs else 1.0,
+        "seconds": round(elapsed, 3),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_near_duplicate_detection())
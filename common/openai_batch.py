@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from common.utils import get_or_create_openai_client
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+BATCH_DIRECTORY = os.environ.get("OPENAI_BATCH_DIR", os.path.join(".cache", "batches"))
+BATCH_POLL_INTERVAL_SECONDS = 30
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def batch_key(requests: Dict[str, dict]) -> str:
+    """Content hash of a set of requests; the same requests map to the same job."""
+    raw = json.dumps(requests, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def write_batch_file(
+    requests: Dict[str, dict], directory: str = BATCH_DIRECTORY
+) -> str:
+    """Write custom_id -> chat completion body as a Batch API input JSONL file."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"input-{batch_key(requests)}.jsonl")
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests.items():
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": body,
+            }
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def _load_batch_state(path: str) -> Optional[dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _save_batch_state(path: str, state: dict) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def parse_batch_output(text: str) -> Dict[str, Optional[str]]:
+    """custom_id -> message content from a Batch API output file (None on error)."""
+    contents: Dict[str, Optional[str]] = {}
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        content = None
+        if response.get("status_code") == 200 and not record.get("error"):
+            choices = (response.get("body") or {}).get("choices") or []
+            if choices:
+                content = (choices[0].get("message") or {}).get("content")
+        contents[record["custom_id"]] = content
+    return contents
+
+
+class OpenAIBatchBackend:
+    """Submits input files to the OpenAI Batch API."""
+
+    def submit(self, path: str) -> str:
+        client = get_or_create_openai_client()
+        with open(path, "rb") as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> Tuple[str, int, int]:
+        """(status, completed requests, total requests)"""
+        batch = get_or_create_openai_client().batches.retrieve(batch_id)
+        counts = batch.request_counts
+        return (
+            batch.status,
+            (counts.completed + counts.failed) if counts else 0,
+            counts.total if counts else 0,
+        )
+
+    def output(self, batch_id: str) -> str:
+        client = get_or_create_openai_client()
+        batch = client.batches.retrieve(batch_id)
+        if not batch.output_file_id:
+            return ""
+        return client.files.content(batch.output_file_id).text
+
+
+class LocalBatchBackend:
+    """
+    Offline stand-in for the Batch API. Each request body is answered by
+    responder(body) -> message content, and the output file uses the Batch API
+    format, so results go through the same parsing as a real batch.
+    """
+
+    def __init__(
+        self,
+        responder: Callable[[dict], str],
+        directory: str = BATCH_DIRECTORY,
+    ):
+        self.responder = responder
+        self.directory = directory
+
+    def submit(self, path: str) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+
+        with open(self._output_path(batch_id), "w", encoding="utf-8") as out:
+            for line in lines:
+                record = {
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": line["custom_id"],
+                    "error": None,
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "model": line["body"].get("model"),
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {
+                                        "role": "assistant",
+                                        "content": self.responder(line["body"]),
+                                    },
+                                }
+                            ],
+                        },
+                    },
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return batch_id
+
+    def status(self, batch_id: str) -> Tuple[str, int, int]:
+        with open(self._output_path(batch_id), encoding="utf-8") as f:
+            done = sum(1 for line in f if line.strip())
+        return "completed", done, done
+
+    def output(self, batch_id: str) -> str:
+        with open(self._output_path(batch_id), encoding="utf-8") as f:
+            return f.read()
+
+    def _output_path(self, batch_id: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"output-{batch_id}.jsonl")
+
+
+async def run_chat_batch(
+    requests: Dict[str, dict],
+    backend=None,
+    poll_interval: float = BATCH_POLL_INTERVAL_SECONDS,
+    on_progress: Optional[Callable[[str], None]] = None,
+    directory: str = BATCH_DIRECTORY,
+) -> Dict[str, Optional[str]]:
+    """
+    Submit custom_id -> chat completion body as one batch, wait for it to finish
+    and return custom_id -> message content. Requests that failed, or that the
+    batch never got to, map to None.
+
+    The batch id is saved in directory under a hash of the requests, so the same
+    requests resume polling the job already submitted (after a rerun or
+    disconnect) and reuse its output once done instead of paying for a new one.
+    Only a job that ended failed, expired or cancelled is resubmitted.
+    """
+    if not requests:
+        return {}
+
+    backend = backend or OpenAIBatchBackend()
+    key = batch_key(requests)
+    os.makedirs(directory, exist_ok=True)
+    state_path = os.path.join(directory, f"{key}.json")
+    output_path = os.path.join(directory, f"output-{key}.jsonl")
+
+    state = _load_batch_state(state_path)
+    if state and state["status"] == "completed" and os.path.exists(output_path):
+        with open(output_path, encoding="utf-8") as f:
+            contents = parse_batch_output(f.read())
+        return {custom_id: contents.get(custom_id) for custom_id in requests}
+
+    resumed = bool(state and state["status"] not in BATCH_TERMINAL_STATUSES)
+    if not resumed:
+        batch_id = backend.submit(write_batch_file(requests, directory))
+        state = {"batch_id": batch_id, "status": "submitted"}
+        _save_batch_state(state_path, state)
+    batch_id = state["batch_id"]
+
+    started = time.monotonic()
+    while True:
+        status, done, total = backend.status(batch_id)
+        if status not in BATCH_TERMINAL_STATUSES and status != state["status"]:
+            state["status"] = status
+            _save_batch_state(state_path, state)
+        if on_progress:
+            on_progress(
+                f"Batch {batch_id}{' (resumed)' if resumed else ''}: {status}, "
+                f"{done}/{total or len(requests)} requests "
+                f"({time.monotonic() - started:.0f}s)"
+            )
+        if status in BATCH_TERMINAL_STATUSES:
+            break
+        await asyncio.sleep(poll_interval)
+
+    output = backend.output(batch_id)
+    if status == "completed":
+        # Keep the output before marking the job done, so a reuse can't find a
+        # completed job without its results
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(output)
+    _save_batch_state(state_path, {"batch_id": batch_id, "status": status})
+
+    contents = parse_batch_output(output)
+    return {custom_id: contents.get(custom_id) for custom_id in requests}
@@ -0,0 +1,85 @@
+import heapq
+import random
+import time
+from typing import Dict, List, Optional
+
+
+def assign_tickets(
+    capacities: Dict[str, int],
+    ticket_queues: Dict[str, List[str]],
+    kind_order: Optional[List[str]] = None,
+    assignments: Optional[Dict[str, List[str]]] = None,
+) -> Dict[str, List[str]]:
+    """
+    Distribute tickets to members in O(T log M).
+
+    capacities maps member name -> how many more tickets they can take (dict order
+    breaks ties). ticket_queues maps a ticket kind -> ticket urls, highest
+    priority first. Members are served from a max-heap on remaining capacity, and
+    each member cycles through kind_order (e.g. ["onboarding", "scrape"] gives
+    onboarding before scrape), falling through to the next kind when one runs out.
+    New tickets are appended to assignments, which is returned.
+    """
+    assignments = assignments if assignments is not None else {}
+    kinds = kind_order or list(ticket_queues)
+    positions = {kind: 0 for kind in kinds}
+
+    heap = [
+        (-capacity, order, name, 0)
+        for order, (name, capacity) in enumerate(capacities.items())
+        if capacity > 0
+    ]
+    heapq.heapify(heap)
+
+    while heap:
+        neg_remaining, order, name, next_kind = heapq.heappop(heap)
+
+        chosen = None
+        for offset in range(len(kinds)):
+            k = (next_kind + offset) % len(kinds)
+            kind = kinds[k]
+            if positions[kind] < len(ticket_queues.get(kind, [])):
+                chosen = k
+                break
+        if chosen is None:
+            # Every queue is exhausted
+            break
+
+        kind = kinds[chosen]
+        assignments.setdefault(name, []).append(ticket_queues[kind][positions[kind]])
+        positions[kind] += 1
+
+        if neg_remaining + 1 < 0:
+            heapq.heappush(
+                heap, (neg_remaining + 1, order, name, (chosen + 1) % len(kinds))
+            )
+
+    return assignments
+
+
+def benchmark_ticket_assignment(
+    n_tickets: int = 100_000, n_members: int = 5_000, seed: int = 7
+) -> Dict[str, float]:
+    rng = random.Random(seed)
+    capacities = {
+        f"member-{i}": rng.choice([2, 5, 10, 20, 40]) for i in range(n_members)
+    }
+    ticket_queues = {
+        "onboarding": [f"onboarding-{i}" for i in range(n_tickets // 4)],
+        "scrape": [f"scrape-{i}" for i in range(n_tickets - n_tickets // 4)],
+    }
+
+    started = time.perf_counter()
+    assignments = assign_tickets(capacities, ticket_queues, ["onboarding", "scrape"])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "tickets": n_tickets,
+        "members": n_members,
+        "assigned": sum(len(urls) for urls in assignments.values()),
+        "seconds": round(elapsed, 3),
+    }
+
+
+if __name__ == "__main__":
+    print(benchmark_ticket_assignment())
@@ -1,23 +1,215 @@
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    InternalServerError,
+    OpenAI,
+    RateLimitError,
+)
+import asyncio
 import csv
 import io
+import json
+import math
+import threading
+import time
+import weakref
 import streamlit as st
 import pandas as pd
 
 from clients.azure_blob_storage.index import get_or_create_blob_service_client
+from common.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from common.gpt_cache import get_or_create_gpt_answer_cache, gpt_cache_key
+from common.gpt_telemetry import record_gpt_call
 
+GPT_MODEL = "gpt-4o"
+GPT_SMALL_MODEL = "gpt-4o-mini"
+# Upper bound for the adaptive limit on concurrent chat completions
+GPT_MAX_CONCURRENCY = 50
 
-def get_gpt_answer(system_prompt, user_prompt, temperature=0.7):
-    openAIClient = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
-    response = openAIClient.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+_openai_client = None
+_openai_client_lock = threading.Lock()
+# httpx async pools are bound to the event loop that opened them, so share one
+# AsyncOpenAI client per loop (each page run uses asyncio.run, and closes its
+# client with close_async_openai_client before the loop ends)
+_async_openai_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_gpt_concurrency_limiters: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_or_create_openai_client() -> OpenAI:
+    global _openai_client
+    with _openai_client_lock:
+        if _openai_client is None:
+            _openai_client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+        return _openai_client
+
+
+def get_or_create_async_openai_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    client = _async_openai_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+        _async_openai_clients[loop] = client
+    return client
+
+
+async def close_async_openai_client() -> None:
+    """Close the running loop's AsyncOpenAI client and its connection pool."""
+    client = _async_openai_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
+def get_or_create_gpt_concurrency_limiter() -> AdaptiveConcurrencyLimiter:
+    """AIMD limit on concurrent chat completions for the running event loop."""
+    loop = asyncio.get_running_loop()
+    limiter = _gpt_concurrency_limiters.get(loop)
+    if limiter is None:
+        limiter = AdaptiveConcurrencyLimiter(
+            maximum=GPT_MAX_CONCURRENCY,
+            overload_errors=(RateLimitError, APITimeoutError, asyncio.TimeoutError),
+            transient_errors=(InternalServerError, APIConnectionError),
+        )
+        _gpt_concurrency_limiters[loop] = limiter
+    return limiter
+
+
+def _create_chat_completion(**kwargs):
+    started = time.monotonic()
+    try:
+        raw = get_or_create_openai_client().chat.completions.with_raw_response.create(
+            **kwargs
+        )
+    except Exception as e:
+        record_gpt_call(
+            kwargs["model"], None, time.monotonic() - started, error=repr(e)
+        )
+        raise
+    response = raw.parse()
+    record_gpt_call(
+        kwargs["model"],
+        response.usage,
+        time.monotonic() - started,
+        retries=raw.retries_taken,
+    )
+    return response
+
+
+async def _create_chat_completion_async(**kwargs):
+    # The limiter owns retries so it sees every 429 and timeout; it also retries
+    # 5xx and connection errors, which the SDK would otherwise have retried
+    client = get_or_create_async_openai_client().with_options(max_retries=0)
+    attempts = []
+
+    def attempt():
+        attempts.append(time.monotonic())
+        return client.chat.completions.create(**kwargs)
+
+    try:
+        response = await get_or_create_gpt_concurrency_limiter().call(attempt)
+    except Exception as e:
+        if attempts:
+            record_gpt_call(
+                kwargs["model"],
+                None,
+                time.monotonic() - attempts[-1],
+                retries=len(attempts) - 1,
+                error=repr(e),
+            )
+        raise
+    # Latency of the attempt that succeeded, not time spent queued or backing off
+    record_gpt_call(
+        kwargs["model"],
+        response.usage,
+        time.monotonic() - attempts[-1],
+        retries=len(attempts) - 1,
+    )
+    return response
+
+
+def _gpt_messages(system_prompt, user_prompt):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def get_gpt_answer(system_prompt, user_prompt, temperature=0.7, use_cache=True):
+    cache = get_or_create_gpt_answer_cache() if use_cache else None
+    key = gpt_cache_key(GPT_MODEL, temperature, system_prompt, user_prompt)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = _create_chat_completion(
+        model=GPT_MODEL,
+        messages=_gpt_messages(system_prompt, user_prompt),
+        temperature=temperature,
+    )
+    answer = response.choices[0].message.content.strip().lower()
+    if cache:
+        cache.set(key, answer)
+    return answer
+
+
+async def get_gpt_answer_async(
+    system_prompt, user_prompt, temperature=0.7, use_cache=True
+):
+    cache = get_or_create_gpt_answer_cache() if use_cache else None
+    key = gpt_cache_key(GPT_MODEL, temperature, system_prompt, user_prompt)
+    if cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    response = await _create_chat_completion_async(
+        model=GPT_MODEL,
+        messages=_gpt_messages(system_prompt, user_prompt),
+        temperature=temperature,
+    )
+    answer = response.choices[0].message.content.strip().lower()
+    if cache:
+        cache.set(key, answer)
+    return answer
+
+
+async def get_gpt_answer_with_confidence_async(
+    system_prompt, user_prompt, temperature=0.7, model=GPT_MODEL
+):
+    """
+    Uncached one-word answer plus the model's probability for its first token,
+    read from the logprobs.
+    """
+    response = await _create_chat_completion_async(
+        model=model,
+        messages=_gpt_messages(system_prompt, user_prompt),
+        temperature=temperature,
+        logprobs=True,
+        max_tokens=3,
+    )
+    choice = response.choices[0]
+    answer = (choice.message.content or "").strip().lower()
+    tokens = choice.logprobs.content if choice.logprobs else None
+    confidence = math.exp(tokens[0].logprob) if tokens else 0.0
+    return answer, confidence
+
+
+async def get_gpt_json_answer_async(
+    system_prompt, user_prompt, json_schema, temperature=0.7, model=GPT_MODEL
+):
+    """Ask for a response matching json_schema and return it parsed."""
+    response = await _create_chat_completion_async(
+        model=model,
+        messages=_gpt_messages(system_prompt, user_prompt),
         temperature=temperature,
+        response_format={"type": "json_schema", "json_schema": json_schema},
     )
-    return response.choices[0].message.content.strip().lower()
+    content = response.choices[0].message.content or ""
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed JSON from GPT: {content[:200]}") from e
 
 
 def csv_to_json(file_content):
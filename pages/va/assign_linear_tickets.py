@@ -5,14 +5,34 @@ from datetime import datetime, timedelta
 
 
 from clients.linear.index import (
-    create_linear_ticket,
-    get_pending_linear_tickets,
+    create_linear_tickets,
+    get_pending_linear_tickets_by_title,
     get_unstarted_linear_tickets,
-    update_linear_ticket_title,
+    update_linear_ticket_titles,
 )
 from clients.smartlead.index import get_campaigns
+from common.text_matching import MultiPatternMatcher
+from common.ticket_assignment import assign_tickets
 from common.utils import csv_to_json, upload_triage_data
-from pages.va import deduplicate_linear_tickets
+from pages.va.deduplicate_linear_tickets import deduplicate_linear_tickets
+
+
+def _report_assignments(
+    before: Dict[str, int],
+    assignments: Dict[str, List[str]],
+    members: List[Dict[str, str]],
+    label: str,
+) -> None:
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    for i, member in enumerate(members):
+        name = member["name"]
+        assigned = len(assignments.get(name, [])) - before.get(name, 0)
+        if assigned:
+            status_text.write(f"✅ Assigned {assigned} {label} to **{name}**")
+        else:
+            status_text.write(f"⚠️ No {label} left to assign to **{name}**")
+        progress_bar.progress((i + 1) / len(members))
 
 
 def assign_onboarding_and_scraping_tickets(
@@ -25,60 +45,32 @@ def assign_onboarding_and_scraping_tickets(
     PART_TIME_LEADS_QUOTA = 5  # 5 onboarding + scrape
     SUPPORT_MEMBER_QUOTA = 2  # 1 onboarding + 1 scrape
 
-    onboarding_index = 0
-    scrape_index = 0
-
     st.write(
         f"Assigning onboarding and scrape tickets to **{len(members)}** members..."
     )
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    for i, member in enumerate(members):
-        name = member["name"]
-        hours = member["hours"]
-        role = member["role"]
 
+    capacities = {}
+    for member in members:
         # Determine base quota
-        if role == "support":
+        if member["role"] == "support":
             base_quota = SUPPORT_MEMBER_QUOTA
-        elif hours == "full-time":
+        elif member["hours"] == "full-time":
             base_quota = FULL_TIME_LEADS_QUOTA
         else:
             base_quota = PART_TIME_LEADS_QUOTA
+        capacities[member["name"]] = base_quota - len(
+            assignments.get(member["name"], [])
+        )
 
-        existing_assignments = assignments.get(name, [])
-        quota = base_quota - len(existing_assignments)
-        assigned_to_member = 0
-
-        while assigned_to_member < quota:
-            ticket_assigned = False
-
-            # Assign onboarding ticket first
-            if onboarding_index < len(onboarding_ticket_urls):
-                ticket_url = onboarding_ticket_urls[onboarding_index]
-                assignments.setdefault(name, []).append(ticket_url)
-                onboarding_index += 1
-                assigned_to_member += 1
-                ticket_assigned = True
-
-                if assigned_to_member >= quota:
-                    break
-
-            # Then assign scrape ticket
-            if scrape_index < len(scrape_ticket_urls):
-                ticket_url = scrape_ticket_urls[scrape_index]
-                assignments.setdefault(name, []).append(ticket_url)
-                scrape_index += 1
-                assigned_to_member += 1
-                ticket_assigned = True
-
-            # If nothing was assigned, avoid infinite loop
-            if not ticket_assigned:
-                break
-
-        status_text.write(f"✅ Assigned {assigned_to_member} tickets to **{name}**")
-        progress_bar.progress((i + 1) / len(members))
+    before = {name: len(urls) for name, urls in assignments.items()}
+    # Each member alternates onboarding then scrape tickets
+    assign_tickets(
+        capacities,
+        {"onboarding": onboarding_ticket_urls, "scrape": scrape_ticket_urls},
+        kind_order=["onboarding", "scrape"],
+        assignments=assignments,
+    )
+    _report_assignments(before, assignments, members, "tickets")
 
     st.success("🎉 All members have been assigned tickets.")
     return assignments
@@ -92,40 +84,26 @@ def assign_email_tickets(
     EMAIL_MEMBER_QUOTA = 20  # Each member gets 20 email tickets
 
     st.write(f"📧 Assigning email tickets to **{len(members)}** members...")
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    total_members = len(members)
-
-    for i, member in enumerate(members):
-        name = member["name"]
-
-        if len(email_ticket_urls) > 0:
-            # Take first 20 email tickets
-            email_tickets_to_assign = email_ticket_urls[:EMAIL_MEMBER_QUOTA]
-
-            # Add to member's existing assignments
-            member_assignments = assignments.get(name, [])
-            member_assignments.extend(email_tickets_to_assign)
-            assignments[name] = member_assignments
-
-            # Remove assigned tickets from pool
-            email_ticket_urls = email_ticket_urls[EMAIL_MEMBER_QUOTA:]
 
-            status_text.write(
-                f"✅ Assigned {len(email_tickets_to_assign)} email tickets to **{name}**"
-            )
-        else:
-            status_text.write(f"⚠️ No email tickets available to assign to **{name}**")
-
-        progress_bar.progress((i + 1) / total_members)
+    before = {name: len(urls) for name, urls in assignments.items()}
+    assign_tickets(
+        {m["name"]: EMAIL_MEMBER_QUOTA for m in members},
+        {"email": email_ticket_urls},
+        assignments=assignments,
+    )
+    _report_assignments(before, assignments, members, "email tickets")
 
     st.success("🎉 Email ticket assignment complete.")
     return assignments
 
 
 def find_completed_campaigns_and_create_tickets() -> List[Dict[str, Any]]:
-    pending_tickets = get_pending_linear_tickets()
+    # Only automated scrape tickets can match a completed campaign
+    pending_tickets = get_pending_linear_tickets_by_title(
+        title_starts_with="[AUTOMATED",
+        title_contains="Scrape",
+        fields=["id", "title", "description"],
+    )
     smartlead_campaigns = get_campaigns()
     conn = st.connection("postgresql", type="sql")
     query = """
@@ -152,16 +130,24 @@ LEFT JOIN platform_organizations po ON slc."platformOrganizationId" = po.id
     today_tag = datetime.now().strftime("%y_%m_%d")
     tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
     completed_campaign_tickets = []
+    tickets_to_create = []
+    titles_to_update = {}
+
+    # Scan each ticket description once for every campaign name, keeping the
+    # first matching ticket per campaign
+    matcher = MultiPatternMatcher(c.get("name") for c in completed_campaigns)
+    ticket_by_campaign_name = {}
+    for t in pending_tickets:
+        title = t.get("title") or ""
+        if "AUTOMATED" not in title or "Scrape" not in title:
+            continue
+        for name in matcher.find_all(t.get("description") or ""):
+            ticket_by_campaign_name.setdefault(name, t)
+
     for campaign in completed_campaigns:
         campaign_name = campaign.get("name")
         campaign_id = campaign.get("id")
-        matching_ticket = None
-        for t in pending_tickets:
-            desc = t.get("description") or ""
-            title = t.get("title") or ""
-            if campaign_name in desc and "AUTOMATED" in title and "Scrape" in title:
-                matching_ticket = t
-                break
+        matching_ticket = ticket_by_campaign_name.get(campaign_name)
         if not matching_ticket:
             new_title = (
                 f"[AUTOMATED | {today_tag} | COMPLETED CAMPAIGN]: "
@@ -172,13 +158,7 @@ LEFT JOIN platform_organizations po ON slc."platformOrganizationId" = po.id
                 f"https://app.smartlead.ai/app/email-campaign/{campaign_id}/analytics"
             )
 
-            new_ticket = create_linear_ticket(
-                {
-                    "title": new_title,
-                    "description": description,
-                }
-            )
-            completed_campaign_tickets.append(new_ticket)
+            tickets_to_create.append({"title": new_title, "description": description})
             continue
         existing_title = matching_ticket.get("title", "")
 
@@ -191,16 +171,32 @@ LEFT JOIN platform_organizations po ON slc."platformOrganizationId" = po.id
             updated_title = re.sub(
                 r"^\[AUTOMATED \| \d{4}-\d{2}-\d{2}\]:", updated_prefix, existing_title
             )
-
-            updated_issue = update_linear_ticket_title(
-                issue_id=matching_ticket["id"], title=updated_title
-            )
-
-            if updated_issue:
-                completed_campaign_tickets.append(updated_issue)
+            titles_to_update[matching_ticket["id"]] = updated_title
 
         completed_campaign_tickets.append(matching_ticket)
 
+    # Apply all writes in a handful of batched requests
+    errors = []
+    for ticket, result in zip(
+        tickets_to_create, create_linear_tickets(tickets_to_create)
+    ):
+        if isinstance(result, Exception):
+            errors.append(f"Error creating ticket '{ticket['title']}': {result}")
+        else:
+            completed_campaign_tickets.append(result)
+    for (ticket_id, title), result in zip(
+        titles_to_update.items(), update_linear_ticket_titles(titles_to_update)
+    ):
+        if isinstance(result, Exception):
+            errors.append(f"Error renaming ticket {ticket_id} to '{title}': {result}")
+        elif result.get("issue"):
+            completed_campaign_tickets.append(result["issue"])
+
+    for error in errors:
+        st.warning(error)
+    if errors:
+        st.warning(f"{len(errors)} completed-campaign ticket writes failed")
+
     return completed_campaign_tickets
 
 
@@ -216,39 +212,14 @@ def assign_completed_campaigns_tickets(
     st.write(
         f"🎯 Assigning completed campaign tickets to **{len(members)}** members..."
     )
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    total_members = len(members)
-
-    for i, member in enumerate(members):
-        name = member["name"]
-
-        if len(completed_campaign_ticket_urls) > 0:
-            # Take first 40 tickets
-            tickets_to_assign = completed_campaign_ticket_urls[
-                :COMPLETED_CAMPAIGN_MEMBER_QUOTA
-            ]
-
-            # Add to this member’s assignment list
-            member_assignments = assignments.get(name, [])
-            member_assignments.extend(tickets_to_assign)
-            assignments[name] = member_assignments
 
-            # Remove assigned tickets from pool
-            completed_campaign_ticket_urls = completed_campaign_ticket_urls[
-                COMPLETED_CAMPAIGN_MEMBER_QUOTA:
-            ]
-
-            status_text.write(
-                f"✅ Assigned {len(tickets_to_assign)} completed campaign tickets to **{name}**"
-            )
-        else:
-            status_text.write(
-                f"⚠️ No completed campaign tickets left to assign to **{name}**"
-            )
-
-        progress_bar.progress((i + 1) / total_members)
+    before = {name: len(urls) for name, urls in assignments.items()}
+    assign_tickets(
+        {m["name"]: COMPLETED_CAMPAIGN_MEMBER_QUOTA for m in members},
+        {"completed": completed_campaign_ticket_urls},
+        assignments=assignments,
+    )
+    _report_assignments(before, assignments, members, "completed campaign tickets")
 
     st.success("🎉 Completed campaign ticket assignment finished.")
     return assignments
@@ -307,7 +278,7 @@ def assign_tickets_to_team_members():
             else:
                 existing_scrape.append({"ticketTitle": title, "ticketUrl": url})
     st.write("Fetching pending Linear tickets...")
-    pending = get_unstarted_linear_tickets()
+    pending = get_unstarted_linear_tickets(fields=["id", "title", "priority", "url"])
     scrape_tickets = []
     email_tickets = []
     onboarding_tickets = []
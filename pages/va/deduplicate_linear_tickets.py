@@ -1,70 +1,129 @@
-import re
-import time
-import streamlit as st
-from datetime import datetime
+from typing import Optional
 
-from clients.linear.index import get_pending_linear_tickets, remove_linear_ticket
+import pandas as pd
+import streamlit as st
 
+from clients.linear.index import get_pending_linear_tickets_by_title
+from common.linear_dedup import (
+    execute_linear_ticket_deduplication,
+    plan_linear_ticket_deduplication,
+)
 
-def deduplicate_linear_tickets():
-    st.title("Deduplicate Linear Tickets")
+# Ticket ids of the near-duplicate groups shown in the last preview
+PREVIEWED_NEAR_DUPLICATES_KEY = "previewed_near_duplicate_ticket_ids"
 
-    st.write("Fetching pending Linear tickets...")
-    issues = get_pending_linear_tickets()
-    st.write(f"Found **{len(issues)}** issues to deduplicate.")
 
-    title_map = {}  # { core_title: [issues] }
+def _group_ticket_ids(group) -> frozenset:
+    return frozenset(t["id"] for t in [group["keep"], *group["remove"]])
 
-    # Group tickets by core title
-    pattern = re.compile(
-        r"^\[AUTOMATED \| \d{4}-\d{2}-\d{2}\]: (.+?) \d{4}-\d{2}-\d{2}$"
-    )
 
-    for issue in issues:
-        title = issue["title"]
-        match = pattern.match(title)
-        if match:
-            core_title = match.group(1)
-            title_map.setdefault(core_title, []).append(issue)
+def deduplicate_linear_tickets(
+    dry_run: bool = False,
+    similarity_threshold: Optional[float] = None,
+    close_near_duplicates: bool = False,
+):
+    st.title("Deduplicate Linear Tickets")
 
-    total_closed = 0
-    groups = list(title_map.keys())
+    st.write("Fetching pending automated Linear tickets...")
+    fields = ["id", "title", "updatedAt"]
+    if similarity_threshold is not None:
+        fields.append("description")
+    issues = get_pending_linear_tickets_by_title(
+        title_starts_with="[AUTOMATED", fields=fields
+    )
+    st.write(f"Found **{len(issues)}** issues to deduplicate.")
 
-    st.write(f"Processing **{len(groups)}** groups of duplicated tickets...")
+    plan = plan_linear_ticket_deduplication(issues, similarity_threshold)
+    exact_plan = [group for group in plan if not group["nearDuplicate"]]
+    near_plan = [group for group in plan if group["nearDuplicate"]]
+    total_to_close = sum(len(group["remove"]) for group in exact_plan)
+    st.write(
+        f"Found **{len(exact_plan)}** groups of duplicated tickets "
+        f"(**{total_to_close}** tickets to close)."
+    )
 
-    progress = st.progress(0)
-    status = st.empty()
-
-    for idx, core_title in enumerate(groups, start=1):
-        tickets = title_map[core_title]
-        try:
-            if len(tickets) > 1:
-                tickets.sort(
-                    key=lambda t: datetime.fromisoformat(
-                        t["updatedAt"].replace("Z", "+00:00")
-                    )
-                )
-
-                tickets_to_close = tickets[:-1]
-
-                for t in tickets_to_close:
-                    remove_linear_ticket(t["id"])
-                    total_closed += 1
-
-                status.write(
-                    f"Closed **{len(tickets_to_close)}** duplicate tickets for: "
-                    f"**{core_title}**"
-                )
-        except Exception as e:
-            status.write(
-                f"Error processing tickets for **{core_title}**: {str(e) or 'Unknown error'}"
+    if exact_plan:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "coreTitle": group["coreTitle"],
+                        "keepTitle": group["keep"]["title"],
+                        "ticketsToClose": len(group["remove"]),
+                    }
+                    for group in exact_plan
+                ]
             )
-            continue
-
-        progress.progress(idx / len(groups))
-        time.sleep(2)
+        )
+
+    if near_plan:
+        st.write(
+            f"Found **{len(near_plan)}** groups of near-duplicate tickets "
+            f"(**{sum(len(g['remove']) for g in near_plan)}** tickets). Check "
+            "them below; they are only closed once confirmed."
+        )
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "keepTitle": group["keep"]["title"],
+                        "closeTitles": "\n".join(t["title"] for t in group["remove"]),
+                    }
+                    for group in near_plan
+                ]
+            )
+        )
+
+    if dry_run:
+        st.session_state[PREVIEWED_NEAR_DUPLICATES_KEY] = [
+            sorted(_group_ticket_ids(group)) for group in near_plan
+        ]
+        return
+
+    if near_plan and close_near_duplicates:
+        # Only groups exactly as previewed count as confirmed
+        previewed = {
+            frozenset(ids)
+            for ids in st.session_state.get(PREVIEWED_NEAR_DUPLICATES_KEY, [])
+        }
+        confirmed = [g for g in near_plan if _group_ticket_ids(g) in previewed]
+        if len(confirmed) < len(near_plan):
+            st.warning(
+                f"Skipping {len(near_plan) - len(confirmed)} near-duplicate groups "
+                "that were not in the last preview"
+            )
+        exact_plan += confirmed
+    elif near_plan:
+        st.info("Near-duplicate groups were not confirmed, so they are kept.")
 
-    st.success(f"Total tickets closed: **{total_closed}**")
+    if not exact_plan:
+        return
 
+    progress = st.progress(0)
+    result = execute_linear_ticket_deduplication(
+        exact_plan, on_progress=lambda done, total: progress.progress(done / total)
+    )
 
-deduplicate_linear_tickets()
+    for error in result["errors"]:
+        st.write(f"Error closing tickets: {error}")
+
+    st.success(f"Total tickets closed: **{result['closed']}**")
+
+
+if __name__ == "__page__":
+    dry_run = st.checkbox("Dry run (preview duplicates without closing them)")
+    similarity_threshold = None
+    close_near_duplicates = False
+    if st.checkbox("Also catch near-duplicates (reworded titles, different dates)"):
+        similarity_threshold = st.slider(
+            "Similarity threshold", min_value=0.5, max_value=1.0, value=0.8, step=0.05
+        )
+        close_near_duplicates = st.checkbox(
+            "Close the near-duplicate groups from the last dry run"
+        )
+    if dry_run or st.button("Close duplicate tickets"):
+        deduplicate_linear_tickets(
+            dry_run=dry_run,
+            similarity_threshold=similarity_threshold,
+            close_near_duplicates=close_near_duplicates,
+        )
@@ -1,5 +1,6 @@
 import asyncio
 import os
+import time
 from datetime import datetime
 from io import BytesIO
 
@@ -14,7 +15,16 @@ from clients.smartlead.index import (
     get_leads_by_campaign_id_with_pagination,
 )
 from clients.smartlead.internal.index import remove_multiple_leads_from_campaign
-from common.utils import chunk_list, csv_to_json, get_gpt_answer
+from common.gpt_cache import get_or_create_gpt_answer_cache
+from common.gpt_telemetry import gpt_telemetry_run
+from common.lead_classification import (
+    CASCADE_CONFIDENCE_THRESHOLD,
+    EMBEDDING_MATCH_THRESHOLD,
+    EMBEDDING_NO_MATCH_THRESHOLD,
+    classify_leads,
+    format_tier_stats,
+)
+from common.utils import close_async_openai_client, csv_to_json
 
 # ========================== Helpers ==========================
 
@@ -44,53 +54,9 @@ def upload_filtered_leads_to_blob(
     return blob_client.url
 
 
-async def is_outside_whitelisted_area(location: str, whitelisted_areas: str) -> bool:
-    if not location or not whitelisted_areas:
-        return False
-    system = (
-        "You are a helpful assistant that filters addresses based on whitelisted areas. "
-        "The whitelisted areas are:\n" + whitelisted_areas.replace(";", "\n")
-    )
-    prompt = (
-        f"Is the address {location} located within any of the whitelisted areas? "
-        f"You answer should strictly be 'yes' or 'no'"
-    )
-    ans = await asyncio.to_thread(get_gpt_answer, system, prompt)
-    return (ans or "").strip().lower() == "no"
-
-
-async def is_in_blocklisted_industry(
-    industry: str, blocklisted_industries: str
-) -> bool:
-    if not industry or not blocklisted_industries:
-        return False
-    system = (
-        "You are a helpful assistant that filters industries based on blocklisted industries:\n"
-        + blocklisted_industries.replace(";", "\n")
-    )
-    prompt = (
-        f"Does the industry {industry} match any of the blocklisted industries? "
-        f"Answer strictly 'yes' or 'no'"
-    )
-    ans = await asyncio.to_thread(get_gpt_answer, system, prompt)
-    return (ans or "").strip().lower() == "yes"
-
-
-async def is_outside_whitelisted_industry(
-    industry: str, whitelisted_industries: str
-) -> bool:
-    if not industry or not whitelisted_industries:
-        return False
-    system = (
-        "You are a helpful assistant that filters industries based on whitelisted industries:\n"
-        + whitelisted_industries.replace(";", "\n")
-    )
-    prompt = (
-        f"Does the industry {industry} stay within any of the whitelisted industries? "
-        f"Answer strictly 'yes' or 'no'"
-    )
-    ans = await asyncio.to_thread(get_gpt_answer, system, prompt, 0.2)
-    return (ans or "").strip().lower() == "no"
+def normalize_lead_values(values: pd.Series) -> pd.Series:
+    """Lowercase and collapse whitespace so trivially different values match."""
+    return values.fillna("").astype(str).str.lower().str.split().str.join(" ")
 
 
 async def process_leads(
@@ -99,38 +65,82 @@ async def process_leads(
     blocklisted_industries: str,
     whitelisted_industries: str,
     whitelisted_areas: str,
+    embedding_thresholds: tuple[float, float] = (
+        EMBEDDING_NO_MATCH_THRESHOLD,
+        EMBEDDING_MATCH_THRESHOLD,
+    ),
+    use_batch_api: bool = False,
+    cascade_threshold: float | None = CASCADE_CONFIDENCE_THRESHOLD,
+    tier_stats: dict | None = None,
 ) -> list[dict]:
     """Return the subset of leads to remove, based on location/industry rules."""
-    leads_to_remove: list[dict] = []
-    batches = list(chunk_list(raw_leads, 50))
-    total_batches = len(batches)
+    if not raw_leads:
+        return []
+
+    leads = pd.DataFrame(
+        {
+            "location": [lead.get("Location") for lead in raw_leads],
+            "industry": [lead.get("informalIndustry") for lead in raw_leads],
+        }
+    )
+    leads["location"] = normalize_lead_values(leads["location"])
+    leads["industry"] = normalize_lead_values(leads["industry"])
 
+    # Each distinct location / industry is classified once, then joined back
+    started = time.monotonic()
     status_placeholder = st.empty()
-    for batch_idx, batch in enumerate(batches, 1):
-        status_placeholder.text(
-            f"Processing batch {batch_idx}/{total_batches} ({len(batch)} leads)..."
-        )
+    status_placeholder.text(
+        f"Classifying {leads['location'].nunique()} distinct locations and "
+        f"{leads['industry'].nunique()} distinct industries for {len(raw_leads)} leads..."
+    )
 
-        async def check_one(lead: dict):
-            loc = lead.get("Location")
-            industry = lead.get("informalIndustry")
-            if await is_outside_whitelisted_area(loc, whitelisted_areas):
-                return lead
-            if await is_in_blocklisted_industry(industry, blocklisted_industries):
-                return lead
-            if await is_outside_whitelisted_industry(industry, whitelisted_industries):
-                return lead
-            return None
-
-        results = await asyncio.gather(*(check_one(lead) for lead in batch))
-        filtered = [x for x in results if x is not None]
-        leads_to_remove.extend(filtered)
-        status_placeholder.text(
-            f"Batch {batch_idx}/{total_batches} complete: {len(filtered)} leads filtered out"
+    try:
+        verdicts_by_check = await classify_leads(
+            leads,
+            {
+                "outside_whitelisted_area": ("location", whitelisted_areas),
+                "in_blocklisted_industry": ("industry", blocklisted_industries),
+                "outside_whitelisted_industry": ("industry", whitelisted_industries),
+            },
+            embedding_thresholds=embedding_thresholds,
+            on_progress=status_placeholder.text,
+            use_batch_api=use_batch_api,
+            cascade_threshold=cascade_threshold,
+            tier_stats=tier_stats,
         )
+    finally:
+        # The client's pool belongs to this run's event loop; don't leave it open
+        await close_async_openai_client()
+    outside_area = pd.Series(verdicts_by_check["outside_whitelisted_area"], dtype=bool)
+    blocklisted = pd.Series(verdicts_by_check["in_blocklisted_industry"], dtype=bool)
+    outside_industry = pd.Series(
+        verdicts_by_check["outside_whitelisted_industry"], dtype=bool
+    )
+
+    location_verdicts = outside_area.rename("outside_area").rename_axis("location")
+    industry_verdicts = pd.concat(
+        [
+            blocklisted.rename("blocklisted"),
+            outside_industry.rename("outside_industry"),
+        ],
+        axis=1,
+    ).rename_axis("industry")
+
+    verdicts = leads.merge(
+        location_verdicts.reset_index(), on="location", how="left"
+    ).merge(industry_verdicts.reset_index(), on="industry", how="left")
+    # Values that weren't classified (empty) merge in as NaN and never remove
+    remove = (
+        verdicts[["outside_area", "blocklisted", "outside_industry"]]
+        .eq(True)
+        .any(axis=1)
+    )
 
+    leads_to_remove = [raw_leads[i] for i in remove[remove].index]
+    elapsed = time.monotonic() - started
     status_placeholder.text(
-        f"Processing complete: {len(leads_to_remove)} total leads to remove"
+        f"Processing complete: {len(leads_to_remove)} total leads to remove "
+        f"({len(raw_leads) / max(elapsed, 1e-6):.1f} leads/s over {elapsed:.1f}s)"
     )
     return leads_to_remove
 
@@ -151,6 +161,9 @@ ss.setdefault("leads_to_remove", [])
 ss.setdefault("lead_details", [])
 ss.setdefault("filtered_blob_url", "")
 ss.setdefault("removing", False)
+ss.setdefault("gpt_cache_summary", "")
+ss.setdefault("gpt_run_summary", "")
+ss.setdefault("gpt_call_log_csv", "")
 
 # Connect to PostgreSQL once
 conn = st.connection("postgresql", type="sql")
@@ -237,20 +250,70 @@ whitelisted_industries = st.text_input(
 whitelisted_areas = st.text_input(
     "Whitelisted areas (semicolon separated)", key="whitelisted_areas"
 )
+with st.expander("Industry embedding prefilter"):
+    st.caption(
+        "Industries whose similarity to the list is outside this band are decided "
+        "without GPT; only the band in between is sent to the model."
+    )
+    embedding_thresholds = st.slider(
+        "Cosine similarity band (no match ≤ low, match ≥ high)",
+        min_value=0.0,
+        max_value=1.0,
+        value=(EMBEDDING_NO_MATCH_THRESHOLD, EMBEDDING_MATCH_THRESHOLD),
+        step=0.05,
+        key="embedding_thresholds",
+    )
+use_batch_api = st.checkbox(
+    "Use the OpenAI Batch API (cheaper for very large lead files, can take hours)",
+    key="use_batch_api",
+)
+with st.expander("Model cascade"):
+    use_cascade = st.checkbox(
+        "Ask the small model first and escalate low-confidence answers",
+        value=True,
+        key="use_cascade",
+    )
+    cascade_threshold = st.slider(
+        "Minimum confidence to accept the small model's answer",
+        min_value=0.5,
+        max_value=1.0,
+        value=CASCADE_CONFIDENCE_THRESHOLD,
+        step=0.01,
+        key="cascade_threshold",
+        disabled=not use_cascade,
+    )
 
 # ========================== Actions ==========================
 
 # 1) Filter & upload
 if st.button("🚀 Filter and Upload Leads", key="filter_upload_btn"):
     with st.spinner("Filtering leads... please wait"):
-        leads_to_remove = asyncio.run(
-            process_leads(
-                raw_leads,
-                blocklisted_industries=blocklisted_industries,
-                whitelisted_industries=whitelisted_industries,
-                whitelisted_areas=whitelisted_areas,
+        tier_stats = {}
+        with gpt_telemetry_run() as gpt_run:
+            leads_to_remove = asyncio.run(
+                process_leads(
+                    raw_leads,
+                    blocklisted_industries=blocklisted_industries,
+                    whitelisted_industries=whitelisted_industries,
+                    whitelisted_areas=whitelisted_areas,
+                    embedding_thresholds=embedding_thresholds,
+                    use_batch_api=use_batch_api,
+                    cascade_threshold=cascade_threshold if use_cascade else None,
+                    tier_stats=tier_stats,
+                )
             )
+        cache_stats = get_or_create_gpt_answer_cache().stats()
+        ss.gpt_cache_summary = (
+            f"GPT answer cache: {cache_stats['hit_rate']:.0%} hit rate "
+            f"({cache_stats['memory_hits']} memory, {cache_stats['disk_hits']} disk, "
+            f"{cache_stats['misses']} misses since startup)"
         )
+        ss.gpt_run_summary = gpt_run.summary_text()
+        ss.gpt_call_log_csv = (
+            gpt_run.to_frame().to_csv(index=False) if gpt_run.calls else ""
+        )
+        if tier_stats:
+            ss.gpt_cache_summary += f" · Model tiers: {format_tier_stats(tier_stats)}"
         if not leads_to_remove:
             st.info("✅ No leads matched the filter criteria.")
             # Clear stale state
@@ -285,6 +348,19 @@ if st.button("🚀 Filter and Upload Leads", key="filter_upload_btn"):
     # Ensure the “Remove” CTA renders immediately with the computed state
     st.rerun()
 
+if ss.gpt_cache_summary:
+    st.caption(ss.gpt_cache_summary)
+if ss.gpt_run_summary:
+    st.caption(f"Last run: {ss.gpt_run_summary}")
+if ss.gpt_call_log_csv:
+    st.download_button(
+        "⬇️ Download GPT call log (CSV)",
+        data=ss.gpt_call_log_csv,
+        file_name=f"gpt_calls_{datetime.now():%Y%m%d_%H%M%S}.csv",
+        mime="text/csv",
+        key="gpt_call_log_download",
+    )
+
 # 2) Show removal CTA when we have data
 if ss.lead_details:
     st.info(
@@ -1,14 +1,12 @@
 import streamlit as st
 import numpy as np
-from openai import OpenAI
+
+from common.embedding_store import get_or_create_embedding_store
+from common.embeddings import get_embeddings
 
 # Streamlit page config
 st.title("Cosine Similarity of Two Terms (OpenAI Embeddings)")
 
-# Get API key from Streamlit secrets
-api_key = st.secrets["OPENAI_API_KEY"]
-client = OpenAI(api_key=api_key)
-
 # User inputs
 term1 = st.text_input("Enter first term or sentence:", "")
 term2 = st.text_input("Enter second term or sentence:", "")
@@ -29,10 +27,8 @@ if st.button("Compute Similarity"):
         st.stop()
 
     with st.spinner("Generating embeddings..."):
-        # Generate embeddings
-        emb1 = client.embeddings.create(model=model_name, input=term1).data[0].embedding
-
-        emb2 = client.embeddings.create(model=model_name, input=term2).data[0].embedding
+        # Reuses stored vectors across sessions; only new terms call the API
+        emb1, emb2 = get_embeddings([term1, term2], model=model_name)
 
         # Calculate cosine similarity
         similarity = cosine_similarity(emb1, emb2)
@@ -43,3 +39,12 @@ if st.button("Compute Similarity"):
     st.write(
         "**Tip:** Values closer to `1.0` mean more similar; closer to `0` mean unrelated."
     )
+
+    store = get_or_create_embedding_store(model_name)
+    neighbours = store.search(emb1, k=6)[0]
+    neighbours = [(text, score) for text, score in neighbours if text != term1][:5]
+    if neighbours:
+        st.subheader(f"Closest stored terms to “{term1}”")
+        st.table(
+            [{"term": text, "similarity": f"{score:.4f}"} for text, score in neighbours]
+        )